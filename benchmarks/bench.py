@@ -0,0 +1,270 @@
+# Benchmarks of network construction, attack/defend steps and full runs.
+#   python benchmarks/bench.py --suite quick              compare against benchmarks/baseline.json
+#   python benchmarks/bench.py --suite full --output results.json
+#   python benchmarks/bench.py --save-baseline --rounds 3 record a new baseline on this machine
+# The exit status is 1 when a stage regressed against the baseline.
+import os
+import sys
+import gc
+import json
+import time
+import random
+import argparse
+import platform
+import itertools
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src import Network, Simulation
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+# Network sizes of each suite, main.py uses 250 computers
+SUITES = {
+    'quick': [250, 1000],
+    'full': [250, 1000, 10000, 100000],
+}
+# Above this size the pairwise generator is quadratic, so the app graphs are drawn with gnp at a fixed mean degree
+PAIRWISE_LIMIT = 1000
+# Edge density of each size class: edge probability for pairwise graphs, mean degree for gnp graphs
+DENSITIES = {
+    'pairwise': [0.1, 0.4, 0.8],
+    'gnp': [2, 8, 32],
+}
+NUM_APP_VERSIONS = [1, 3, 5]
+STRATEGIES = ['Static', 'Proactive', 'Reactive']
+TIME_STEPS = 30
+TAUS = [0.05 * i for i in range(11)]
+
+
+def benchmark_cases(sizes: list[int], engines: list[str]) -> list[dict]:
+    # One base case per size and engine, then each axis (density, versions, strategy) varied on its own
+    cases = []
+    for num_computers, engine in itertools.product(sizes, engines):
+        graph_model = 'pairwise' if num_computers <= PAIRWISE_LIMIT else 'gnp'
+        densities = DENSITIES[graph_model]
+        base = {'num_computers': num_computers, 'graph_model': graph_model, 'density': densities[1], 'num_app_versions': 3, 'd_strategy': 'Static', 'engine': engine}
+        variations = [('density', densities), ('num_app_versions', NUM_APP_VERSIONS), ('d_strategy', STRATEGIES)]
+        for name, values in variations:
+            for value in values:
+                case = dict(base, **{name: value})
+                if case not in cases:
+                    cases.append(case)
+    return cases
+
+
+def case_name(case: dict) -> str:
+    return f"n{case['num_computers']}-{case['graph_model']}-d{case['density']}-v{case['num_app_versions']}-{case['d_strategy']}-{case['engine']}"
+
+
+def network_params(case: dict) -> dict:
+    params = {'num_computers': case['num_computers'], 'num_app_versions': case['num_app_versions'], 'compromised_sw': 5, 'graph_model': case['graph_model']}
+    if case['graph_model'] == 'pairwise':
+        params['edge_probability'] = case['density']
+    else:
+        params['mean_degree'] = case['density']
+    return params
+
+
+def measure(function, setup=None, repeat: int = 7, memory: bool = False) -> dict:
+    # Median wall time over repeat calls of function(setup()), setup is not timed, with the interquartile
+    # range of the calls as the spread. The peak traced memory comes from one extra call, so tracing does
+    # not slow down the timed ones
+    seconds = []
+    for _ in range(repeat):
+        arg = setup() if setup is not None else None
+        gc.collect()
+        start = time.perf_counter()
+        function(arg)
+        seconds.append(time.perf_counter() - start)
+    quartiles = np.percentile(seconds, [25, 50, 75])
+    result = {'seconds': float(quartiles[1]), 'spread': float(quartiles[2] - quartiles[0]), 'best': min(seconds)}
+    if memory:
+        arg = setup() if setup is not None else None
+        gc.collect()
+        tracemalloc.start()
+        function(arg)
+        result['peak_bytes'] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return result
+
+
+def reference_work(_=None) -> int:
+    # Fixed Python and NumPy work, timed with every case so a slower machine or a busy neighbour is told
+    # apart from a slower code path
+    total = 0
+    for i in range(100000):
+        total += i * i % 7
+    np.sort(np.random.default_rng(0).random(100000))
+    return total
+
+
+def run_case(case: dict, repeat: int = 7, seed: int = 0) -> dict:
+    params = network_params(case)
+    network = Network(**params, seed=seed)
+
+    def simulation(_=None) -> Simulation:
+        return Simulation(network.fork(seed), case['d_strategy'], 'Random', case['engine'])
+
+    # Layer sizes and positions of the app graphs, as build_parts hands them to Network.draw_edges
+    layers = {}
+    for sw_type, graph in network.graph.items():
+        nodes = list(graph.nodes())
+        layers[sw_type] = (len(nodes), np.array([(network.computers[node.id].x_position, network.computers[node.id].y_position) for node in nodes], dtype=float).reshape(-1, 2))
+
+    def draw_graph(_=None) -> dict:
+        # Edges of both app graphs drawn from per-layer streams and assembled, the graph path of a seeded network
+        return {sw_type: network.layer_graph(network.layer_nodes(sw_type), network.draw_edges(num_nodes, points, random.Random(seed)))
+                for sw_type, (num_nodes, points) in layers.items()}
+
+    def attack_steps(sim: Simulation):
+        for _ in range(5):
+            sim.attacker.attack()
+
+    def defend_steps(sim: Simulation):
+        for _ in range(5):
+            sim.attacker.attack()
+            sim.defender.defend()
+
+    stages = {
+        'build': measure(lambda _: Network(**params, seed=seed), repeat=repeat, memory=True),
+        'draw_graph': measure(draw_graph, repeat=repeat),
+        # One full attack cycle, and one with the defender answering every step
+        'attack_cycle': measure(attack_steps, simulation, repeat=repeat),
+        'attack_defend_cycle': measure(defend_steps, simulation, repeat=repeat),
+        'random_algorithm': measure(lambda sim: sim.defender.random_algorithm(0.5), simulation, repeat=repeat),
+        'run': measure(lambda sim: sim.run(TIME_STEPS, TAUS, verbose=False), simulation, repeat=repeat, memory=True),
+    }
+    return {'name': case_name(case), 'case': case, 'stages': stages, 'reference': measure(reference_work, repeat=repeat)}
+
+
+def merge_timings(timings: list[dict]) -> dict:
+    # One measurement from the same measurement in several rounds: the median of the medians, with the range
+    # across the rounds as the spread when it is wider than the spread within them
+    medians = [timing['seconds'] for timing in timings]
+    merged = {
+        'seconds': float(np.median(medians)),
+        'spread': max(max(medians) - min(medians), float(np.median([timing['spread'] for timing in timings]))),
+        'best': min(timing['best'] for timing in timings),
+    }
+    if 'peak_bytes' in timings[0]:
+        merged['peak_bytes'] = int(np.median([timing['peak_bytes'] for timing in timings]))
+    return merged
+
+
+def merge_rounds(rounds: list[dict]) -> dict:
+    # Results of the same case over several rounds of the suite, a noisy machine varies more between rounds than within one
+    merged = dict(rounds[0])
+    merged['stages'] = {stage: merge_timings([result['stages'][stage] for result in rounds]) for stage in rounds[0]['stages']}
+    merged['reference'] = merge_timings([result['reference'] for result in rounds])
+    return merged
+
+
+def machine_info() -> dict:
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def compare(results: dict, baseline: dict, threshold: float = 0.25, min_seconds: float = 1e-2, min_bytes: int = 1 << 20, noise: float = 3.0) -> list[str]:
+    # Stages slower (or using more memory) than the baseline by more than threshold. The baseline timings of a case
+    # are first scaled by how much slower the reference work ran alongside it (never tightened when it ran faster,
+    # the reference is as noisy as the stages). A slowdown must also exceed min_seconds
+    # and noise times the spread of the two measurements, and a memory increase min_bytes: the stages of the small
+    # cases run for a few milliseconds, where scheduling noise alone exceeds threshold
+    previous = {result['name']: result for result in baseline['results']}
+    regressions = []
+    for result in results['results']:
+        if result['name'] not in previous:
+            continue
+        old_result = previous[result['name']]
+        scale = 1.0
+        if 'reference' in result and 'reference' in old_result:
+            scale = max(1.0, result['reference']['seconds'] / old_result['reference']['seconds'])
+        for stage, current in result['stages'].items():
+            old = old_result['stages'].get(stage)
+            if old is None:
+                continue
+            expected = old['seconds'] * scale
+            slowdown = current['seconds'] - expected
+            tolerance = max(expected * threshold, min_seconds, noise * (old.get('spread', 0.0) * scale + current.get('spread', 0.0)))
+            if slowdown > tolerance:
+                regressions.append(f"{result['name']} {stage}: {old['seconds']:.4f}s -> {current['seconds']:.4f}s ({current['seconds'] / old['seconds']:.2f}x, {current['seconds'] / expected:.2f}x at the reference speed)")
+            if 'peak_bytes' in current and 'peak_bytes' in old:
+                growth = current['peak_bytes'] - old['peak_bytes']
+                if growth > max(old['peak_bytes'] * threshold, min_bytes):
+                    regressions.append(f"{result['name']} {stage}: {old['peak_bytes'] / 2**20:.1f} MiB -> {current['peak_bytes'] / 2**20:.1f} MiB peak")
+    return regressions
+
+
+def format_table(results: dict) -> str:
+    stages = list(results['results'][0]['stages']) if results['results'] else []
+    lines = [f"{'case':<44}" + ''.join(f"{stage:>20}" for stage in stages) + f"{'build MiB':>11}{'run MiB':>9}"]
+    for result in results['results']:
+        line = f"{result['name']:<44}" + ''.join(f"{result['stages'][stage]['seconds'] * 1000:>18.2f}ms" for stage in stages)
+        line += f"{result['stages']['build']['peak_bytes'] / 2**20:>11.1f}{result['stages']['run']['peak_bytes'] / 2**20:>9.1f}"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Time network construction, attack/defend steps and full runs")
+    parser.add_argument('--suite', choices=sorted(SUITES), default='quick')
+    parser.add_argument('--sizes', type=int, nargs='+', help="network sizes, overriding the suite")
+    parser.add_argument('--engines', nargs='+', default=['object'], choices=['object', 'array'])
+    parser.add_argument('--repeat', type=int, default=7, help="timed calls per stage, the median is compared")
+    parser.add_argument('--rounds', type=int, default=1, help="runs of the whole suite, merged into one result per case")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--filter', help="only run the cases whose name contains this string")
+    parser.add_argument('--output', help="write the results to this JSON file")
+    parser.add_argument('--baseline', default=BASELINE, help="results to compare against")
+    parser.add_argument('--save-baseline', action='store_true', help="store the results as the new baseline")
+    parser.add_argument('--threshold', type=float, default=0.25, help="relative slowdown reported as a regression")
+    parser.add_argument('--min-seconds', type=float, default=1e-2, help="slowdowns below this many seconds are ignored")
+    parser.add_argument('--min-bytes', type=int, default=1 << 20, help="peak memory increases below this many bytes are ignored")
+    args = parser.parse_args(argv)
+
+    cases = benchmark_cases(args.sizes or SUITES[args.suite], args.engines)
+    if args.filter:
+        cases = [case for case in cases if args.filter in case_name(case)]
+    results = {'machine': machine_info(), 'repeat': args.repeat, 'rounds': args.rounds, 'seed': args.seed, 'results': []}
+    rounds = [[] for _ in cases]
+    for round_index in range(args.rounds):
+        for case, case_rounds in zip(cases, rounds):
+            print(f"Running {case_name(case)} (round {round_index + 1}/{args.rounds})", file=sys.stderr)
+            case_rounds.append(run_case(case, args.repeat, args.seed))
+    results['results'] = [merge_rounds(case_rounds) for case_rounds in rounds]
+    print(format_table(results))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=1)
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=1)
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}, run with --save-baseline to create one")
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, args.threshold, args.min_seconds, args.min_bytes)
+    if baseline['machine'] != results['machine']:
+        print("The baseline was recorded on a different machine, timings may not be comparable")
+    if regressions:
+        print(f"{len(regressions)} regression(s) against {args.baseline}:")
+        print("\n".join(regressions))
+        return 1
+    print(f"No regression against {args.baseline}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
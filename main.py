@@ -1,10 +1,16 @@
+import random
+
 from matplotlib import pyplot as plt
 
 from src import Simulation, Network
 
+# Networks below draw from the global random stream
+random.seed(12)
+
 net_base = Network(250, 1, 5, 5)
 net1 = Network(250, 3, 5)
-net2 = Network(250, 3, 5)
+# Same topology and initial compromise as net1, so the two strategies start from identical conditions
+net2 = net1.fork()
 
 sim_base = Simulation(net_base, 'Static', 'Random')
 sim1 = Simulation(net1, 'Static', 'Random')
@@ -1,3 +1,9 @@
 from .simulation import Simulation
-from .visuliaztion import plot
-from .models import Network, Attacker, Defender
\ No newline at end of file
+from .visuliaztion import plot, animate
+from .models import Network, Attacker, Defender, Profiler, profiler
+from .ensemble import run_ensemble, EnsembleResult
+from .adaptive import run_adaptive, AdaptiveResult
+from .surrogate import MeanFieldSurrogate, calibrate
+from .sweep import run_sweep, ResultCache
+from .recorder import TrajectoryRecorder
+from .batch import BatchedSimulation, run_batched
\ No newline at end of file
@@ -0,0 +1,121 @@
+import os
+import math
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .models import Network
+from .simulation import Simulation
+from .ensemble import EnsembleResult, replica_seed
+
+
+def run_adaptive_replica(config: dict, taus: list[float], time_steps: int, seed: int) -> tuple[list[float], int]:
+    # One truncated trajectory of a configuration: TTS per tau (NaN if not reached) and the number of simulated steps
+    network = Network(**config['network_params'], seed=seed)
+    simulation = Simulation(network, config.get('d_strategy', 'Static'), config.get('d_algorithm', 'Random'), config.get('engine', 'object'), **(config.get('defender_params') or {}))
+    simulation.run(time_steps, taus, verbose=False, truncate=True)
+    tts = [math.nan if tts is None else float(tts) for tts in simulation.recorder.tts(taus)]
+    return tts, len(simulation.recorder)
+
+
+def _run_adaptive_replica(args: tuple) -> tuple[list[float], int]:
+    return run_adaptive_replica(*args)
+
+
+class AdaptiveResult:
+    def __init__(self, name: str, taus: list[float], tts: np.ndarray, steps: int, confidence: float = 0.95, baseline: 'AdaptiveResult' = None):
+        self.name = name
+        self.taus = list(taus)
+        self.steps = steps
+        self.ensemble = EnsembleResult(taus, tts, confidence)
+        # ASD against the baseline, paired replica by replica (same replica seed) over the replicas both ran
+        self.asd = None
+        if baseline is not None:
+            paired = min(len(tts), len(baseline.ensemble.tts))
+            self.asd = EnsembleResult(taus, tts[:paired] - baseline.ensemble.tts[:paired], confidence)
+        self.converged = False
+
+    def __len__(self):
+        return len(self.ensemble)
+
+    def widths(self, min_reached: float) -> np.ndarray:
+        # Confidence interval widths on the TTS (and the ASD) of the taus reached often enough to be estimated
+        results = [self.ensemble] if self.asd is None else [self.ensemble, self.asd]
+        widths = []
+        for result in results:
+            width = result.ci[:, 1] - result.ci[:, 0]
+            # Too few samples for a variance: infinitely wide
+            width = np.where(result.count < 2, np.inf, width)
+            widths.append(width[self.ensemble.reached >= min_reached])
+        return np.concatenate(widths)
+
+
+def run_adaptive(configs: dict[str, dict], taus: list[float], baseline: str = None, target_width: float = 1.0, batch_size: int = 8,
+                 min_replicas: int = 16, max_replicas: int = 1000, time_steps: int = 500, min_reached: float = 0.1, seed: int = 0,
+                 workers: int = None, confidence: float = 0.95) -> dict[str, AdaptiveResult]:
+    # Run replicas of every configuration in rounds until the confidence interval on the TTS of each tau (and
+    # on the ASD against the baseline configuration) is narrower than target_width, or max_replicas is reached.
+    # A configuration is described by network_params, d_strategy, d_algorithm, engine and defender_params, as in
+    # run_replica. Replica r of every configuration uses the same seed, so the ASD is paired. Every round, each
+    # unfinished configuration gets the replicas its current widths suggest it still needs (the width shrinks as
+    # 1 / sqrt(n)), so the noisy configurations receive the compute. Taus reached by less than min_reached of
+    # the replicas are reported but not waited for. Replicas stop once the attacker is exhausted
+    if baseline is not None and baseline not in configs:
+        raise ValueError(f"Unknown baseline configuration {baseline}")
+    tts = {name: np.empty((0, len(taus))) for name in configs}
+    steps = dict.fromkeys(configs, 0)
+    results = {}
+    requested = {name: min_replicas for name in configs}
+    workers = workers or os.cpu_count() or 1
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        while any(requested.values()):
+            # The paired ASD needs the baseline replicas of every index the other configurations run
+            if baseline is not None:
+                furthest = max(len(tts[name]) + count for name, count in requested.items())
+                requested[baseline] = max(requested[baseline], min(furthest, max_replicas) - len(tts[baseline]))
+            tasks, owners = [], []
+            for name, count in requested.items():
+                for replica in range(len(tts[name]), len(tts[name]) + count):
+                    tasks.append((configs[name], taus, time_steps, replica_seed(seed, replica)))
+                    owners.append(name)
+            if executor is None:
+                outcomes = [_run_adaptive_replica(task) for task in tasks]
+            else:
+                outcomes = list(executor.map(_run_adaptive_replica, tasks, chunksize=max(1, len(tasks) // (4 * workers))))
+            for name in configs:
+                rows = [outcome for owner, outcome in zip(owners, outcomes) if owner == name]
+                if rows:
+                    tts[name] = np.concatenate([tts[name], np.array([row[0] for row in rows], dtype=float).reshape(-1, len(taus))])
+                    steps[name] += sum(row[1] for row in rows)
+
+            if baseline is not None:
+                results[baseline] = AdaptiveResult(baseline, taus, tts[baseline], steps[baseline], confidence)
+            for name in configs:
+                if name != baseline:
+                    results[name] = AdaptiveResult(name, taus, tts[name], steps[name], confidence, results.get(baseline))
+            requested = {}
+            for name, result in results.items():
+                widths = result.widths(min_reached)
+                result.converged = bool(np.all(widths <= target_width))
+                replicas = len(result)
+                if result.converged or replicas >= max_replicas:
+                    requested[name] = 0
+                    continue
+                # Replicas needed for the widest interval, assuming its width keeps shrinking as 1 / sqrt(n)
+                worst = widths.max() if len(widths) else np.inf
+                needed = replicas * (worst / target_width) ** 2 if np.isfinite(worst) else 2 * replicas
+                # Move half way to the estimate, at least one batch, so a poor early variance estimate does not overshoot
+                count = max(batch_size, math.ceil((needed - replicas) / 2 / batch_size) * batch_size)
+                requested[name] = min(count, max_replicas - replicas)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    return results
+
+
+def adaptive_summary(results: dict[str, AdaptiveResult]) -> str:
+    lines = [f"{'configuration':<24} {'replicas':>8} {'steps':>8} {'converged':>10}"]
+    for name, result in results.items():
+        lines.append(f"{name:<24} {len(result):>8} {result.steps:>8} {str(result.converged):>10}")
+    return "\n".join(lines)
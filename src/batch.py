@@ -0,0 +1,107 @@
+import numpy as np
+
+from .models import Network, NetworkArrays
+from .ensemble import EnsembleResult
+
+
+# Replicas of one network simulated together, the state of replica r is row r of each matrix
+class BatchedSimulation:
+    def __init__(self, network: Network, d_strategy: str, d_algorithm: str, replicas: int, seed: int = 0):
+        if d_strategy.lower() not in ("static", "proactive"):
+            raise ValueError(f"Batched simulation supports the Static and Proactive strategies, not {d_strategy}")
+        if d_algorithm.lower() != "random":
+            raise ValueError(f"Batched simulation supports the Random algorithm, not {d_algorithm}")
+        self.network = network
+        self.arrays = NetworkArrays(network)
+        self.d_strategy = d_strategy
+        self.replicas = replicas
+        # One random stream per replica, so a replica does not depend on the batch size
+        self.rngs = [np.random.default_rng(child) for child in np.random.SeedSequence(seed).spawn(replicas)]
+        arrays = self.arrays
+        self.state = np.tile(arrays.state, (replicas, 1))
+        self.attack_phase = np.tile(arrays.attack_phase, (replicas, 1))
+        self.implementation = np.tile(arrays.implementation, (replicas, 1))
+        self.computer_state = np.tile(arrays.computer_state, (replicas, 1))
+        # Implementations of each software type occupy a contiguous range of NetworkArrays.implementations
+        num_versions = np.array([len(network.os_versions), len(network.app1_versions), len(network.app2_versions)])
+        self.version_start = (np.cumsum(num_versions) - num_versions)[arrays.sw_type]
+        self.version_count = num_versions[arrays.sw_type]
+        self.known = self.init_knowledge()
+        self.t = 0
+        self.cc = np.zeros(replicas)
+
+    def init_knowledge(self) -> np.ndarray:
+        known = (self.state == 1) & (self.attack_phase == -1)
+        self.attack_phase[known] = 0
+        return known
+
+    def installation_phase(self):
+        installing = self.known & (self.attack_phase == 0)
+        self.attack_phase[installing] = 1
+        self.state[installing] = 1
+
+    def discovery_phase(self):
+        discovering = self.known & (self.attack_phase == 1)
+        self.attack_phase[discovering] = 2
+        connected = self.arrays.kernel.expand(discovering)
+        self.known |= connected & (self.attack_phase == -1) & ~self.known & (self.state != 2) & self.arrays.exploitable[self.implementation]
+
+    def privilege_escalation_phase(self):
+        escalating = self.known & (self.arrays.sw_type != 0) & (self.attack_phase == 2)
+        self.attack_phase[escalating] = 3
+        connected = self.arrays.kernel.expand(escalating)
+        self.attack_phase[connected & (self.attack_phase == -1) & self.known & (self.arrays.sw_type == 0)] = 0
+
+    def lateral_movement_phase(self):
+        moving = self.known & ((self.attack_phase == 2) | (self.attack_phase == 3))
+        self.attack_phase[moving] = 4
+        connected = self.arrays.kernel.expand(moving)
+        self.attack_phase[connected & (self.attack_phase == -1) & self.known & (self.arrays.sw_type != 0)] = 0
+
+    def causing_damages_phase(self):
+        damaging = self.known & (self.attack_phase == 4)
+        self.attack_phase[damaging] = 5
+
+    def update_state(self):
+        compromised = np.maximum.reduceat(self.state == 1, self.arrays.offsets, axis=1)
+        self.computer_state = np.minimum.reduceat(self.state, self.arrays.offsets, axis=1)
+        self.computer_state[compromised] = 1
+        self.cc = (self.computer_state == 1).sum(axis=1) / self.network.num_computers
+
+    def attack(self):
+        phases = [self.installation_phase, self.discovery_phase, self.privilege_escalation_phase, self.lateral_movement_phase, self.causing_damages_phase]
+        phases[self.t % 5]()
+        self.update_state()
+
+    def random_algorithm(self, proportion: float):
+        # Defender.random_algorithm for every replica: pick computers, then a uniform implementation of the right type per software
+        selected = np.stack([rng.random(self.network.num_computers) < proportion for rng in self.rngs])[:, self.arrays.host]
+        draws = np.stack([rng.random(len(self.arrays.host)) for rng in self.rngs])
+        new_implementation = (self.version_start + (draws * self.version_count).astype(np.int64)).astype(np.int32)
+        self.implementation = np.where(selected, new_implementation, self.implementation)
+        reset = selected & (self.state != 1)
+        self.state[reset] = self.arrays.reset_state[new_implementation[reset]]
+
+    def defend(self):
+        if self.d_strategy.lower() == "proactive" and self.t % 5 == 0:
+            self.random_algorithm(0.5)
+
+    def run(self, time_steps: int, taus: list[float]) -> np.ndarray:
+        # Time to compromise of each replica (rows) for each tau (columns), NaN if not reached
+        taus = np.asarray(taus, dtype=float)
+        tts = np.full((self.replicas, len(taus)), np.nan)
+        for _ in range(time_steps):
+            self.attack()
+            self.defend()
+            newly_reached = np.isnan(tts) & (self.cc[:, None] >= taus[None, :])
+            tts[newly_reached] = self.t
+            self.t += 1
+            if not np.isnan(tts).any():
+                break
+        return tts
+
+
+def run_batched(network: Network, d_strategy: str, d_algorithm: str, time_steps: int, taus: list[float], replicas: int, seed: int = 0, confidence: float = 0.95) -> EnsembleResult:
+    # TTS distribution of replicas sharing the topology and initial compromise of network
+    simulation = BatchedSimulation(network, d_strategy, d_algorithm, replicas, seed)
+    return EnsembleResult(taus, simulation.run(time_steps, taus), confidence)
@@ -0,0 +1,77 @@
+import os
+import math
+from statistics import NormalDist
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .models import Network
+from .simulation import Simulation
+
+
+def spawn_seeds(seed: int, replicas: int) -> list[int]:
+    # Independent child streams of one root seed, one per replica
+    return [replica_seed(seed, replica) for replica in range(replicas)]
+
+
+def replica_seed(seed: int, replica: int) -> int:
+    # Seed of one replica, the same as spawn_seeds(seed, n)[replica] for any n
+    return int(np.random.SeedSequence(seed, spawn_key=(replica,)).generate_state(1, dtype=np.uint64)[0])
+
+
+def run_replica(network_params: dict, d_strategy: str, d_algorithm: str, time_steps: int, taus: list[float], seed: int, engine: str = "object", defender_params: dict = None) -> list[float]:
+    # Run one trajectory on its own random stream, NaN for the taus that were not reached
+    network = Network(**network_params, seed=seed)
+    simulation = Simulation(network, d_strategy, d_algorithm, engine, **(defender_params or {}))
+    _, tts_list = simulation.run(time_steps, taus, verbose=False)
+    return [float(tts) for tts in tts_list] + [math.nan] * (len(taus) - len(tts_list))
+
+
+def _run_replica(args: tuple) -> list[float]:
+    return run_replica(*args)
+
+
+class EnsembleResult:
+    def __init__(self, taus: list[float], tts: np.ndarray, confidence: float = 0.95):
+        self.taus = list(taus)
+        # Time to compromise, one row per replica and one column per tau
+        self.tts = tts
+        self.confidence = confidence
+        reached = ~np.isnan(tts)
+        self.count = reached.sum(axis=0)
+        self.reached = self.count / len(tts) if len(tts) else np.zeros(len(self.taus))
+        self.mean = np.full(len(self.taus), math.nan)
+        self.var = np.full(len(self.taus), math.nan)
+        for i in range(len(self.taus)):
+            samples = tts[reached[:, i], i]
+            if len(samples) > 0:
+                self.mean[i] = samples.mean()
+            if len(samples) > 1:
+                self.var[i] = samples.var(ddof=1)
+        # Normal approximation of the confidence interval on the mean
+        z = NormalDist().inv_cdf(0.5 + confidence / 2)
+        half_width = z * np.sqrt(self.var / np.maximum(self.count, 1))
+        self.ci = np.stack([self.mean - half_width, self.mean + half_width], axis=1)
+
+    def __len__(self):
+        return len(self.tts)
+
+    def summary(self) -> str:
+        lines = [f"{'tau':>6} {'reached':>8} {'mean':>8} {'var':>8} {'ci_low':>8} {'ci_high':>8}"]
+        for i, tau in enumerate(self.taus):
+            lines.append(f"{tau:>6.2f} {self.reached[i]:>8.2f} {self.mean[i]:>8.2f} {self.var[i]:>8.2f} {self.ci[i, 0]:>8.2f} {self.ci[i, 1]:>8.2f}")
+        return "\n".join(lines)
+
+
+def run_ensemble(network_params: dict, d_strategy: str, d_algorithm: str, time_steps: int, taus: list[float], replicas: int, seed: int = 0, workers: int = None, engine: str = "object", confidence: float = 0.95, defender_params: dict = None) -> EnsembleResult:
+    # Run the replicas of one configuration across a process pool, each on a spawned random stream
+    seeds = spawn_seeds(seed, replicas)
+    tasks = [(network_params, d_strategy, d_algorithm, time_steps, taus, replica_seed, engine, defender_params) for replica_seed in seeds]
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        results = [_run_replica(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(_run_replica, tasks, chunksize=max(1, replicas // (4 * workers))))
+    tts = np.array(results, dtype=float).reshape(replicas, len(taus))
+    return EnsembleResult(taus, tts, confidence)
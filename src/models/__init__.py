@@ -1,3 +1,8 @@
+from .profiling import *
 from .software import *
 from .network import *
-from .ad import *
\ No newline at end of file
+from .graph import *
+from .ad import *
+from .kernel import *
+from .engine import *
+from .storage import *
\ No newline at end of file
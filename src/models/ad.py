@@ -1,12 +1,22 @@
-import random
-from .software import Software
-from .network import Network
+from collections import deque
+
+from .software import Software, Implementation
+from .network import Network, Computer
+from .profiling import profiler, profiled
+
+
+# Span name of each attack phase, in the order of Attacker.attack
+PHASE_SPANS = ['attacker.installation', 'attacker.discovery', 'attacker.privilege_escalation', 'attacker.lateral_movement', 'attacker.causing_damages']
 
 
 # Define the Attacker class
 class Attacker:
     def __init__(self, network: Network):
         self.network = network
+        # Software currently in each active attack phase (0 to 4), the only ones the phases visit
+        self.frontiers = {phase: set() for phase in range(5)}
+        # Software that reached phase 5
+        self.damaged = 0
         # Knowledge about the network, saved as:
         # set of software instances
         self.knowledge = self.init_knowledge()
@@ -24,6 +34,7 @@ class Attacker:
                 if app.state == 1 and app.attack_phase == -1:
                     knowledge.add(app)
                     app.attack_phase = 0
+        self.frontiers[0].update(knowledge)
         return knowledge
 
     def init_strategy(self) -> dict:
@@ -40,107 +51,207 @@ class Attacker:
     
     def installation_phase(self):
         # Update the knowledge, for the 0 phase, the attacker installs the malware
-        for sw in self.knowledge:
-            if sw.attack_phase == 0:
-                sw.attack_phase = 1
-                sw.state = 1
+        for sw in self.frontiers[0]:
+            sw.attack_phase = 1
+            sw.state = 1
+        profiler.count('attacker.transitions', len(self.frontiers[0]))
+        self.frontiers[1].update(self.frontiers[0])
+        self.frontiers[0] = set()
 
     def discovery_phase(self):
         # Update the knowledge, for the 1 phase, the attacker discovers the network
         discovered_sws = set()
-        for sw in self.knowledge:
-            if sw.attack_phase == 1:
-                sw.attack_phase = 2
-                # Get the connected apps
-                connected_sws = self.network.get_connected_software(sw)
-                for connected_sw in connected_sws:
-                    # If the connected software is not compromised, add it to the knowledge
-                    if connected_sw.attack_phase == -1 and connected_sw not in self.knowledge and connected_sw.state != 2:
-                        # Check if there is a exploit matching the vulnerabilities of the connected software
-                        exploits = self.network.exploits[connected_sw.get_software_type()]
-                        vulnerabilities = connected_sw.get_vulnerabilities()
-                        for exploit in exploits:
-                            if vulnerabilities[exploit] == 1:
-                                discovered_sws.add(connected_sw)
-                                break
+        examined = checks = 0
+        for sw in self.frontiers[1]:
+            sw.attack_phase = 2
+            # Get the connected apps
+            connected_sws = self.network.get_connected_software(sw)
+            examined += len(connected_sws)
+            for connected_sw in connected_sws:
+                # If the connected software is not compromised, add it to the knowledge
+                if connected_sw.attack_phase == -1 and connected_sw not in self.knowledge and connected_sw.state != 2:
+                    # Check if there is a exploit matching the vulnerabilities of the connected software,
+                    # counted once per visit (a software reached from several frontier software is checked again)
+                    checks += 1
+                    if self.network.exploitable[connected_sw.implementation]:
+                        discovered_sws.add(connected_sw)
+        profiler.count('attacker.transitions', len(self.frontiers[1]))
+        profiler.count('attacker.neighbours_examined', examined)
+        profiler.count('attacker.exploit_checks', checks)
+        profiler.count('attacker.discovered', len(discovered_sws))
+        self.frontiers[2].update(self.frontiers[1])
+        self.frontiers[1] = set()
         self.knowledge.update(discovered_sws)
 
     def privilege_escalation_phase(self):
         # Upgrade the attack phase for the discovered OS
-        for sw in self.knowledge:
-            if sw.get_software_type() != 'OS' and sw.attack_phase == 2:
+        escalated_sws = set()
+        examined = queued = 0
+        for sw in self.frontiers[2]:
+            if sw.get_software_type() != 'OS':
                 sw.attack_phase = 3
+                escalated_sws.add(sw)
                 connected_sws = self.network.get_connected_software(sw)
+                examined += len(connected_sws)
                 for connected_sw in connected_sws:
                     if connected_sw.attack_phase == -1 and connected_sw in self.knowledge and connected_sw.get_software_type() == 'OS':
                         connected_sw.attack_phase = 0
+                        self.frontiers[0].add(connected_sw)
+                        queued += 1
+        profiler.count('attacker.transitions', len(escalated_sws) + queued)
+        profiler.count('attacker.neighbours_examined', examined)
+        self.frontiers[2] -= escalated_sws
+        self.frontiers[3].update(escalated_sws)
 
     def lateral_movement_phase(self):
         # Upgrade the attack phase for the discovered apps
-        for sw in self.knowledge:
-            if sw.attack_phase == 2 or sw.attack_phase == 3:
-                sw.attack_phase = 4
-                connected_sws = self.network.get_connected_software(sw)
-                for connected_sw in connected_sws:
-                    if connected_sw.attack_phase == -1 and connected_sw in self.knowledge and connected_sw.get_software_type() != 'OS':
-                        connected_sw.attack_phase = 0
+        moving_sws = self.frontiers[2] | self.frontiers[3]
+        examined = queued = 0
+        for sw in moving_sws:
+            sw.attack_phase = 4
+            connected_sws = self.network.get_connected_software(sw)
+            examined += len(connected_sws)
+            for connected_sw in connected_sws:
+                if connected_sw.attack_phase == -1 and connected_sw in self.knowledge and connected_sw.get_software_type() != 'OS':
+                    connected_sw.attack_phase = 0
+                    self.frontiers[0].add(connected_sw)
+                    queued += 1
+        profiler.count('attacker.transitions', len(moving_sws) + queued)
+        profiler.count('attacker.neighbours_examined', examined)
+        self.frontiers[4].update(self.frontiers[2], self.frontiers[3])
+        self.frontiers[2] = set()
+        self.frontiers[3] = set()
 
     def causing_damages_phase(self):
         # Upgrade the attack phase for the phase 4
-        for sw in self.knowledge:
-            if sw.attack_phase == 4:
-                sw.attack_phase = 5
+        for sw in self.frontiers[4]:
+            sw.attack_phase = 5
+        profiler.count('attacker.transitions', len(self.frontiers[4]))
+        self.damaged += len(self.frontiers[4])
+        self.frontiers[4] = set()
+
+    def phase_counts(self) -> list[int]:
+        # Number of software in each attack phase, from 0 to 5
+        return [len(self.frontiers[phase]) for phase in range(5)] + [self.damaged]
+
+    def exhausted(self) -> bool:
+        # No software left in an active phase, nothing can be discovered or compromised any more
+        return not any(self.frontiers.values())
 
     def update_state(self):
-        for computer in self.network.computers:
-            computer.update_state()
-        self.network.update_cc()
-        self.network.update_vc()
-        self.network.update_ic()
+        self.network.update_coverage()
 
+    @profiled('attacker.attack')
     def attack(self):
         attack_choice = self.t % 5
-        if attack_choice == 0:
-            self.installation_phase()
-        elif attack_choice == 1:
-            self.discovery_phase()
-        elif attack_choice == 2:
-            self.privilege_escalation_phase()
-        elif attack_choice == 3:
-            self.lateral_movement_phase()
-        elif attack_choice == 4:
-            self.causing_damages_phase()
+        phases = [self.installation_phase, self.discovery_phase, self.privilege_escalation_phase, self.lateral_movement_phase, self.causing_damages_phase]
+        with profiler.span(PHASE_SPANS[attack_choice]):
+            phases[attack_choice]()
         self.t += 1
-        self.update_state()
+        with profiler.span('attacker.update_state'):
+            self.update_state()
 
 # Define the Defender class
 class Defender:
-    def __init__(self, network: Network, strategy: str, algorithm: str):
+    def __init__(self, network: Network, strategy: str, algorithm: str, response_latency: int = 0, budget: int = None):
         self.network = network
         # Strategy: "Static" or "Proactive" or "Reactive"
         self.strategy = strategy
-        # Function to update the software implementation
-        self.algorithm = self.init_algorithm(algorithm)
+        # Reactive strategy: compromise events are answered response_latency steps after they arrive by
+        # re-implementing the software of the compromised computer and of its graph neighbours, at most budget
+        # software per step (no limit if None), the rest waits in the backlog for the next steps
+        self.response_latency = response_latency
+        self.budget = budget
+        self.events = network.subscribe() if strategy.lower() == "reactive" else None
+        self.pending = deque()
+        self.backlog = deque()
+        self.queued = set()
+        # Name of the function updating the software implementation, see algorithm
+        self.algorithm_name = algorithm
+        # Edges whose two ends share an implementation, per app graph, kept up to date by color_flipping_algorithm
+        self.conflicts = None
+        # Software re-implemented during the last defend call
+        self.actions = 0
         self.t = 0
 
+    @property
+    def algorithm(self):
+        # Bound on each access: a stored bound method would make the defender a reference cycle, keeping its
+        # event queue subscribed until the garbage collector runs
+        return self.init_algorithm(self.algorithm_name)
+
     def init_algorithm(self, algorithm: str):
         if algorithm.lower() == "random":
             return self.random_algorithm
-        elif algorithm.lower == "colorflipping":
+        elif algorithm.lower() == "colorflipping":
             return self.color_flipping_algorithm
 
-    def random_algorithm(self, proportion: float):
+    @profiled('defender.random_algorithm')
+    def random_algorithm(self, proportion: float, computers: list[Computer] = None):
         # Randomly select a proportion of the software redefine the implementation
-        for computer in self.network.computers:
-            if random.random() < proportion:
-                computer.os.update_implementation(random.choice(self.network.os_versions))
+        software, implementations = [], []
+        for computer in computers if computers is not None else self.network.computers:
+            if self.network.rng.random() < proportion:
+                software.append(computer.os)
+                implementations.append(self.network.rng.choice(self.network.os_versions))
                 for app in computer.apps:
-                    app.update_implementation(random.choice(self.network.app1_versions) if app.get_software_type() == 'APP1' else random.choice(self.network.app2_versions))
+                    software.append(app)
+                    implementations.append(self.network.rng.choice(self.network.app1_versions) if app.get_software_type() == 'APP1' else self.network.rng.choice(self.network.app2_versions))
+        self.apply_implementations(software, implementations)
+
+    def apply_implementations(self, software: list[Software], implementations: list[Implementation]):
+        self.actions += len(software)
+        profiler.count('defender.reimplemented', len(software))
+        self.install(software, implementations)
+
+    def install(self, software: list[Software], implementations: list[Implementation]):
+        # Install the chosen implementations, one per software
+        for sw, implementation in zip(software, implementations):
+            sw.update_implementation(implementation)
     
-    def color_flipping_algorithm(self, proportion: float):
-        pass
+    def get_implementation(self, software: Software) -> Implementation:
+        return software.implementation
+
+    def get_versions(self, software: Software) -> list[Implementation]:
+        sw_type = software.get_software_type()
+        if sw_type == 'OS':
+            return self.network.os_versions
+        return self.network.app1_versions if sw_type == 'APP1' else self.network.app2_versions
+
+    def count_conflicts(self) -> dict[str, int]:
+        # Full count of the edges whose two ends share an implementation, per app graph
+        conflicts = {}
+        for sw_type, graph in self.network.graph.items():
+            conflicts[sw_type] = sum(1 for u, v in graph.edges() if self.get_implementation(u) is self.get_implementation(v))
+        return conflicts
+
+    @profiled('defender.color_flipping_algorithm')
+    def color_flipping_algorithm(self, proportion: float, computers: list[Computer] = None):
+        # Randomly select a proportion of the computers and recolor their apps with the implementation
+        # least used by their graph neighbours, only the flipped neighbourhoods are visited
+        if self.conflicts is None:
+            self.conflicts = self.count_conflicts()
+        for computer in computers if computers is not None else self.network.computers:
+            if self.network.rng.random() < proportion:
+                # The OS layer has no graph, any implementation is conflict free
+                self.apply_implementations([computer.os], [self.network.rng.choice(self.network.os_versions)])
+                for app in computer.apps:
+                    self.flip(app)
+
+    def flip(self, app: Software):
+        # Move the app to its least conflicting implementation, ties broken at random
+        sw_type = app.get_software_type()
+        uses = {implementation: 0 for implementation in self.get_versions(app)}
+        for neighbour in self.network.graph[sw_type].neighbors(app):
+            uses[self.get_implementation(neighbour)] += 1
+        fewest = min(uses.values())
+        implementation = self.network.rng.choice([implementation for implementation, count in uses.items() if count == fewest])
+        self.conflicts[sw_type] += uses[implementation] - uses[self.get_implementation(app)]
+        self.apply_implementations([app], [implementation])
 
+    @profiled('defender.defend')
     def defend(self):
+        self.actions = 0
         if self.strategy.lower() == "static":
             if self.t == 0:
                 # Randomly select a proportion of the software and redefine the implementation
@@ -151,6 +262,61 @@ class Defender:
             if self.t % 5 == 0:
                 self.algorithm(0.5)
         elif self.strategy.lower() == "reactive":
-            pass
+            # Re-implement the computers reported as compromised, and their graph neighbourhoods
+            self.respond(self.collect_events())
         self.t += 1
 
+    def close(self):
+        # Stop receiving compromise events, once the defender is finished or replaced by another one
+        if self.events is not None:
+            self.network.unsubscribe(self.events)
+            self.events = None
+
+    def collect_events(self) -> list[Computer]:
+        # Compromised computers whose response is due this step
+        while self.events:
+            self.pending.append((self.t, self.events.popleft()))
+        computers = []
+        while self.pending and self.pending[0][0] + self.response_latency <= self.t:
+            computers.append(self.pending.popleft()[1])
+        return computers
+
+    def is_compromised(self, software: Software) -> bool:
+        return software.state == 1
+
+    @profiled('defender.respond')
+    def respond(self, computers: list[Computer]):
+        # Queue the software of the reported computers and of their graph neighbourhoods, then re-implement the
+        # backlog in order within the budget. Compromised software is skipped, a new implementation leaves it compromised
+        for computer in computers:
+            affected = [computer]
+            for app in computer.apps:
+                for neighbour in self.network.graph[app.get_software_type()].neighbors(app):
+                    affected.append(self.network.get_computer(neighbour.id))
+            for affected_computer in affected:
+                for sw in [affected_computer.os] + affected_computer.apps:
+                    if sw not in self.queued and not self.is_compromised(sw):
+                        self.queued.add(sw)
+                        self.backlog.append(sw)
+        software = []
+        while self.backlog and (self.budget is None or len(software) < self.budget):
+            sw = self.backlog.popleft()
+            self.queued.discard(sw)
+            if not self.is_compromised(sw):
+                software.append(sw)
+        if software:
+            self.reimplement(software)
+
+    def reimplement(self, software: list[Software]):
+        # Re-implement the given software with the algorithm of the defender
+        if self.algorithm_name.lower() == "colorflipping":
+            if self.conflicts is None:
+                self.conflicts = self.count_conflicts()
+            for sw in software:
+                if sw.get_software_type() == 'OS':
+                    self.apply_implementations([sw], [self.network.rng.choice(self.network.os_versions)])
+                else:
+                    self.flip(sw)
+            return
+        self.apply_implementations(software, [self.network.rng.choice(self.get_versions(sw)) for sw in software])
+
@@ -0,0 +1,183 @@
+import numpy as np
+
+from .software import Software, Implementation
+from .network import Network
+from .ad import Attacker, Defender
+from .kernel import SOFTWARE_TYPES, software_adjacency, PropagationKernel
+from .profiling import profiler
+
+
+# Struct-of-arrays view of a network: one slot per software, ordered computer by computer (OS first, then apps)
+class NetworkArrays:
+    def __init__(self, network: Network):
+        self.network = network
+        self.implementations = network.get_implementations()
+        self.implementation_index = {implementation: i for i, implementation in enumerate(self.implementations)}
+        self.software = network.get_softwares()
+        hosts = []
+        offsets = []
+        for i, computer in enumerate(network.computers):
+            offsets.append(len(hosts))
+            hosts.extend([i] * (1 + len(computer.apps)))
+        self.software_index = {sw: i for i, sw in enumerate(self.software)}
+        # Per software arrays
+        self.host = np.array(hosts, dtype=np.int64)
+        self.offsets = np.array(offsets, dtype=np.int64)
+        self.sw_type = np.array([SOFTWARE_TYPES.index(sw.get_software_type()) for sw in self.software], dtype=np.int8)
+        self.implementation = np.array([self.implementation_index[sw.implementation] for sw in self.software], dtype=np.int32)
+        self.state = np.array([sw.state for sw in self.software], dtype=np.int8)
+        self.attack_phase = np.array([sw.attack_phase for sw in self.software], dtype=np.int8)
+        # Per computer arrays
+        self.computer_state = np.array([computer.state for computer in network.computers], dtype=np.int8)
+        # Per implementation tables
+        self.exploitable = self.init_exploitable()
+        self.reset_state = np.array([0 if implementation.is_vulnerable() else 2 for implementation in self.implementations], dtype=np.int8)
+        # Software adjacency (same links as Network.get_connected_software) and its propagation kernel
+        self.indptr, self.indices = software_adjacency(network, self.sw_type, self.offsets)
+        self.kernel = PropagationKernel(self.indptr, self.indices)
+
+    def init_exploitable(self) -> np.ndarray:
+        # Array copy of Network.exploitable, call again after Network.set_exploits
+        return np.array([self.network.exploitable[implementation] for implementation in self.implementations], dtype=bool)
+
+    def update_exploitable(self):
+        self.exploitable = self.init_exploitable()
+
+    def update_computer_state(self):
+        # Vectorized Computer.update_state: compromised if any software is, otherwise the lowest software state
+        compromised = np.maximum.reduceat(self.state == 1, self.offsets)
+        newly_compromised = np.flatnonzero(compromised & (self.computer_state != 1))
+        self.computer_state = np.minimum.reduceat(self.state, self.offsets)
+        self.computer_state[compromised] = 1
+        profiler.count('network.recomputed_computers', len(self.computer_state))
+        profiler.count('network.compromise_events', len(newly_compromised))
+        for i in newly_compromised:
+            self.network.publish(self.network.computers[i])
+
+    def update_coverage(self):
+        # Same quantities as Network.update_vc/update_cc/update_ic
+        counts = np.bincount(self.computer_state, minlength=3)
+        self.network.vc = int(counts[0]) / self.network.num_computers
+        self.network.cc = int(counts[1]) / self.network.num_computers
+        self.network.ic = int(counts[2]) / self.network.num_computers
+
+    def set_implementations(self, software: list[Software], implementations: list[Implementation]):
+        # Scatter new implementations, resetting the state of the software that is not compromised
+        if not software:
+            return
+        index = np.array([self.software_index[sw] for sw in software], dtype=np.int64)
+        implementation = np.array([self.implementation_index[impl] for impl in implementations], dtype=np.int32)
+        self.implementation[index] = implementation
+        self.state[index] = np.where(self.state[index] == 1, 1, self.reset_state[implementation])
+
+    def sync_to_network(self):
+        # Write the array state back to the software and computer objects
+        for i, sw in enumerate(self.software):
+            sw.implementation = self.implementations[self.implementation[i]]
+            sw.state = int(self.state[i])
+            sw.attack_phase = int(self.attack_phase[i])
+        for i, computer in enumerate(self.network.computers):
+            computer.state = int(self.computer_state[i])
+        self.network.recount_coverage()
+
+
+# Attacker running the five phases as masks over NetworkArrays
+class ArrayAttacker(Attacker):
+    def __init__(self, network: Network, arrays: NetworkArrays = None):
+        self.network = network
+        self.arrays = arrays if arrays is not None else NetworkArrays(network)
+        # Knowledge about the network, saved as a boolean mask over the software
+        self.known = self.init_knowledge()
+        self.strategy = self.init_strategy()
+        self.t = 0
+
+    @property
+    def knowledge(self) -> set[Software]:
+        return {self.arrays.software[i] for i in np.flatnonzero(self.known)}
+
+    def init_knowledge(self) -> np.ndarray:
+        arrays = self.arrays
+        known = (arrays.state == 1) & (arrays.attack_phase == -1)
+        arrays.attack_phase[known] = 0
+        return known
+
+    def installation_phase(self):
+        arrays = self.arrays
+        installing = self.known & (arrays.attack_phase == 0)
+        arrays.attack_phase[installing] = 1
+        arrays.state[installing] = 1
+        self.count_work(installing)
+
+    def discovery_phase(self):
+        arrays = self.arrays
+        discovering = self.known & (arrays.attack_phase == 1)
+        arrays.attack_phase[discovering] = 2
+        connected = arrays.kernel.expand(discovering)
+        candidates = connected & (arrays.attack_phase == -1) & ~self.known & (arrays.state != 2)
+        discovered = candidates & arrays.exploitable[arrays.implementation]
+        self.known |= discovered
+        if profiler.enabled:
+            self.count_work(discovering, expanded=True)
+            profiler.count('attacker.exploit_checks', int(candidates.sum()))
+            profiler.count('attacker.discovered', int(discovered.sum()))
+
+    def privilege_escalation_phase(self):
+        arrays = self.arrays
+        escalating = self.known & (arrays.sw_type != 0) & (arrays.attack_phase == 2)
+        arrays.attack_phase[escalating] = 3
+        connected = arrays.kernel.expand(escalating)
+        queued = connected & (arrays.attack_phase == -1) & self.known & (arrays.sw_type == 0)
+        arrays.attack_phase[queued] = 0
+        self.count_work(escalating, queued, expanded=True)
+
+    def lateral_movement_phase(self):
+        arrays = self.arrays
+        moving = self.known & ((arrays.attack_phase == 2) | (arrays.attack_phase == 3))
+        arrays.attack_phase[moving] = 4
+        connected = arrays.kernel.expand(moving)
+        queued = connected & (arrays.attack_phase == -1) & self.known & (arrays.sw_type != 0)
+        arrays.attack_phase[queued] = 0
+        self.count_work(moving, queued, expanded=True)
+
+    def causing_damages_phase(self):
+        arrays = self.arrays
+        damaging = self.known & (arrays.attack_phase == 4)
+        arrays.attack_phase[damaging] = 5
+        self.count_work(damaging)
+
+    def count_work(self, moved: np.ndarray, queued: np.ndarray = None, expanded: bool = False):
+        # Same counters as the Attacker phases: software moved to the next phase and, for the phases
+        # expanding their frontier, the neighbours of the moved software
+        if not profiler.enabled:
+            return
+        profiler.count('attacker.transitions', int(moved.sum()) + (int(queued.sum()) if queued is not None else 0))
+        if expanded:
+            profiler.count('attacker.neighbours_examined', int(np.diff(self.arrays.kernel.indptr)[moved].sum()))
+
+    def phase_counts(self) -> list[int]:
+        attack_phase = self.arrays.attack_phase
+        return np.bincount(attack_phase[attack_phase >= 0], minlength=6).tolist()
+
+    def exhausted(self) -> bool:
+        attack_phase = self.arrays.attack_phase
+        return not ((attack_phase >= 0) & (attack_phase < 5)).any()
+
+    def update_state(self):
+        self.arrays.update_computer_state()
+        self.arrays.update_coverage()
+
+
+# Defender drawing the same random choices as Defender but installing them into NetworkArrays
+class ArrayDefender(Defender):
+    def __init__(self, network: Network, strategy: str, algorithm: str, arrays: NetworkArrays = None, response_latency: int = 0, budget: int = None):
+        self.arrays = arrays if arrays is not None else NetworkArrays(network)
+        super().__init__(network, strategy, algorithm, response_latency, budget)
+
+    def get_implementation(self, software: Software) -> Implementation:
+        return self.arrays.implementations[self.arrays.implementation[self.arrays.software_index[software]]]
+
+    def is_compromised(self, software: Software) -> bool:
+        return self.arrays.state[self.arrays.software_index[software]] == 1
+
+    def install(self, software: list[Software], implementations: list[Implementation]):
+        self.arrays.set_implementations(software, implementations)
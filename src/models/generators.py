@@ -0,0 +1,74 @@
+import math
+import itertools
+from collections import defaultdict
+
+import numpy as np
+
+
+def pairwise_edges(num_nodes: int, p: float, rng) -> np.ndarray:
+    # One draw per pair of nodes, in the order of itertools.combinations (the original generator)
+    edges = [(i, j) for i, j in itertools.combinations(range(num_nodes), 2) if rng.random() < p]
+    return np.array(edges, dtype=np.int64).reshape(-1, 2)
+
+
+def gnp_edges(num_nodes: int, p: float, rng, batch_size: int = 1 << 20) -> np.ndarray:
+    # Same G(n, p) distribution as pairwise_edges, jumping from edge to edge with geometric skips
+    num_pairs = num_nodes * (num_nodes - 1) // 2
+    if p <= 0 or num_pairs == 0:
+        return np.empty((0, 2), dtype=np.int64)
+    if p >= 1:
+        pairs = np.arange(num_pairs, dtype=np.int64)
+    else:
+        generator = np.random.default_rng(rng.getrandbits(64))
+        chunks = []
+        position = -1
+        while position < num_pairs:
+            size = min(batch_size, int((num_pairs - position) * p + 10 * math.sqrt(num_pairs * p) + 16))
+            positions = position + np.cumsum(generator.geometric(p, size))
+            chunks.append(positions)
+            position = int(positions[-1])
+        pairs = np.concatenate(chunks)
+        pairs = pairs[pairs < num_pairs]
+    # Unrank the pair index k into (v, w) with w < v and k = v * (v - 1) / 2 + w
+    v = ((1 + np.sqrt(1 + 8 * pairs.astype(np.float64))) // 2).astype(np.int64)
+    v -= v * (v - 1) // 2 > pairs
+    v += (v + 1) * v // 2 <= pairs
+    w = pairs - v * (v - 1) // 2
+    return np.stack([w, v], axis=1)
+
+
+def spatial_edges(points: np.ndarray, radius: float) -> np.ndarray:
+    # Connect every pair of points closer than radius
+    if len(points) < 2 or radius <= 0:
+        return np.empty((0, 2), dtype=np.int64)
+    # scipy is imported on first use, it dominates the import time of the package
+    try:
+        from scipy.spatial import cKDTree
+    except ImportError:
+        cKDTree = None
+    if cKDTree is not None:
+        return cKDTree(points).query_pairs(radius, output_type='ndarray').astype(np.int64).reshape(-1, 2)
+    # Without scipy, bucket the points in a grid of radius sized cells and compare neighbouring cells
+    cells = defaultdict(list)
+    for i, (x, y) in enumerate(points):
+        cells[(int(x // radius), int(y // radius))].append(i)
+    edges = []
+    for (cx, cy), members in cells.items():
+        for dx, dy in ((0, 0), (1, -1), (1, 0), (1, 1), (0, 1)):
+            others = cells.get((cx + dx, cy + dy))
+            if others is None:
+                continue
+            for i in members:
+                for j in others:
+                    if (dx, dy) == (0, 0) and j <= i:
+                        continue
+                    if math.dist(points[i], points[j]) <= radius:
+                        edges.append((min(i, j), max(i, j)))
+    return np.array(edges, dtype=np.int64).reshape(-1, 2)
+
+
+def radius_for_mean_degree(num_nodes: int, mean_degree: float, area: float) -> float:
+    # Radius giving the requested mean degree for points spread uniformly over the area (ignoring borders)
+    if num_nodes < 2:
+        return 0.0
+    return math.sqrt(mean_degree * area / (math.pi * (num_nodes - 1)))
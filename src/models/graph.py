@@ -0,0 +1,70 @@
+import numpy as np
+
+
+# Immutable undirected graph stored as CSR arrays of neighbour indices
+class CompactGraph:
+    def __init__(self, nodes: list, edges: np.ndarray):
+        self.node_list = list(nodes)
+        self._index = None
+        edges = np.asarray(edges, dtype=np.int64).reshape(-1, 2)
+        num_nodes = len(self.node_list)
+        # Store each edge in both directions, neighbours sorted by node index
+        sources = np.concatenate([edges[:, 0], edges[:, 1]])
+        targets = np.concatenate([edges[:, 1], edges[:, 0]])
+        order = np.lexsort((targets, sources))
+        self.indptr = np.zeros(num_nodes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=num_nodes), out=self.indptr[1:])
+        self.indices = targets[order].astype(np.int32)
+
+    @classmethod
+    def from_csr(cls, nodes: list, indptr: np.ndarray, indices: np.ndarray) -> 'CompactGraph':
+        # Share existing CSR arrays with a new list of nodes
+        graph = cls.__new__(cls)
+        graph.node_list = list(nodes)
+        graph._index = None
+        graph.indptr = indptr
+        graph.indices = indices
+        return graph
+
+    @property
+    def index(self) -> dict:
+        # Node to position lookup, built on the first neighbour query
+        if self._index is None:
+            self._index = {node: i for i, node in enumerate(self.node_list)}
+        return self._index
+
+    def nodes(self) -> list:
+        return self.node_list
+
+    def edges(self):
+        # Each edge once, in the order networkx would iterate it
+        for i, node in enumerate(self.node_list):
+            for j in self.indices[self.indptr[i]:self.indptr[i + 1]].tolist():
+                if j > i:
+                    yield node, self.node_list[j]
+
+    def neighbors(self, node) -> list:
+        i = self.index[node]
+        return [self.node_list[j] for j in self.indices[self.indptr[i]:self.indptr[i + 1]].tolist()]
+
+    def degrees(self) -> np.ndarray:
+        return np.diff(self.indptr)
+
+    def number_of_nodes(self) -> int:
+        return len(self.node_list)
+
+    def number_of_edges(self) -> int:
+        return len(self.indices) // 2
+
+    def edge_array(self) -> np.ndarray:
+        # Each edge once as a (i, j) row of node indices with i < j
+        sources = np.repeat(np.arange(len(self.node_list), dtype=np.int64), self.degrees())
+        upper = sources < self.indices
+        return np.stack([sources[upper], self.indices[upper].astype(np.int64)], axis=1)
+
+    def to_networkx(self):
+        import networkx as nx
+        graph = nx.Graph()
+        graph.add_nodes_from(self.node_list)
+        graph.add_edges_from(self.edges())
+        return graph
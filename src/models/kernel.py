@@ -0,0 +1,85 @@
+import numpy as np
+
+from .graph import CompactGraph
+
+SOFTWARE_TYPES = ['OS', 'APP1', 'APP2']
+
+
+def layer_csr(graph) -> tuple[np.ndarray, np.ndarray]:
+    # CSR arrays of an app graph, converting networkx graphs on the fly
+    if not isinstance(graph, CompactGraph):
+        nodes = list(graph.nodes())
+        index = {node: i for i, node in enumerate(nodes)}
+        graph = CompactGraph(nodes, [(index[u], index[v]) for u, v in graph.edges()])
+    return graph.indptr, graph.indices
+
+
+def software_adjacency(network, sw_type: np.ndarray, offsets: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    # CSR adjacency over all the software (ordered as in Network.get_softwares) with the same links as
+    # Network.get_connected_software: every other software on the same computer, plus the app graph neighbours
+    num_software = len(sw_type)
+    counts = np.diff(np.append(offsets, num_software))
+    rows, cols = [], []
+    # Intra-host links, a computer holds at most one software of each type
+    for a in range(3):
+        for b in range(3):
+            if a == b:
+                continue
+            hosts = np.flatnonzero(counts > max(a, b))
+            rows.append(offsets[hosts] + a)
+            cols.append(offsets[hosts] + b)
+    # App graph links, the nodes of a layer are the apps of its type in computer order
+    for layer, graph in network.graph.items():
+        layer_software = np.flatnonzero(sw_type == SOFTWARE_TYPES.index(layer))
+        indptr, indices = layer_csr(graph)
+        if len(indptr) - 1 != len(layer_software):
+            raise ValueError(f"The {layer} graph does not match the {layer} software of the network")
+        rows.append(np.repeat(layer_software, np.diff(indptr)))
+        cols.append(layer_software[np.asarray(indices, dtype=np.int64)])
+    rows = np.concatenate(rows)
+    cols = np.concatenate(cols)
+    order = np.lexsort((cols, rows))
+    indptr = np.zeros(num_software + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=num_software), out=indptr[1:])
+    return indptr, cols[order]
+
+
+def load_sparse():
+    # scipy.sparse on first use, None when scipy is not installed
+    try:
+        import scipy.sparse as sparse
+    except ImportError:
+        return None
+    return sparse
+
+
+# Frontier expansion as a sparse matrix product: which software has at least one selected neighbour
+class PropagationKernel:
+    def __init__(self, indptr: np.ndarray, indices: np.ndarray):
+        self.indptr = indptr
+        self.indices = indices
+        num_software = len(indptr) - 1
+        sparse = load_sparse()
+        if sparse is not None:
+            data = np.ones(len(indices), dtype=np.int32)
+            self.matrix = sparse.csr_matrix((data, indices, indptr), shape=(num_software, num_software))
+        else:
+            self.matrix = None
+
+    def expand(self, mask: np.ndarray) -> np.ndarray:
+        # mask selects software (one row per replica when 2D), the result has the same shape.
+        # The adjacency is symmetric, so A @ mask counts the selected neighbours of every software
+        if self.matrix is not None:
+            if mask.ndim == 1:
+                return (self.matrix @ mask.astype(np.int32)) > 0
+            return ((self.matrix @ mask.T.astype(np.int32)) > 0).T
+        # Without scipy, gather the neighbour lists of the selected software
+        reached = np.zeros(mask.shape, dtype=bool)
+        rows, sources = np.nonzero(mask.reshape(-1, mask.shape[-1]))
+        starts = self.indptr[sources]
+        lengths = self.indptr[sources + 1] - starts
+        total = int(lengths.sum())
+        if total:
+            positions = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(total)
+            reached.reshape(-1, mask.shape[-1])[np.repeat(rows, lengths), self.indices[positions]] = True
+        return reached
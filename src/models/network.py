@@ -1,16 +1,35 @@
+import copy
 import random
-import itertools
-import networkx as nx
+import logging
+import weakref
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 
 from .software import OperatingSystem, Application, Implementation, Software
+from .graph import CompactGraph
+from . import generators
+from .profiling import profiler, profiled
 
-random.seed(12)
+logger = logging.getLogger(__name__)
+
+# Parts of a network built from their own random streams when it is built in parts, see Network.build_parts
+PART_VERSIONS, PART_COMPUTERS, PART_GRAPHS, PART_COMPROMISE = range(4)
+# Computers drawn per stream, fixed so the assignment does not depend on the number of workers
+ASSIGNMENT_CHUNK = 1 << 16
 
 class Computer:
+    __slots__ = ('id', 'os', 'apps', 'dirty', 'tracker', 'state', 'x_position', 'y_position')
+
     def __init__(self, id: int, os: OperatingSystem, apps: list[Application], x_position, y_position):
         self.id = id
         self.os = os
         self.apps = apps
+        for sw in [os] + apps:
+            sw.host = self
+        # Shared list of the computers to re-evaluate, set by the network
+        self.dirty = False
+        self.tracker = None
         self.update_state()
         # Position in the network, used for visualization
         self.x_position = x_position
@@ -32,102 +51,348 @@ class Computer:
         self.state = state
         return
 
+    def copy(self) -> 'Computer':
+        # Copy with its own software, keeping the current (possibly not yet re-evaluated) state
+        computer = Computer(self.id, self.os.copy(), [app.copy() for app in self.apps], self.x_position, self.y_position)
+        computer.state = self.state
+        return computer
+
+    def mark_dirty(self):
+        if self.dirty or self.tracker is None:
+            return
+        self.dirty = True
+        self.tracker.append(self)
+
 class Network:
-    def __init__(self, num_computers: int, num_app_versions: int, compromised_sw: int, num_exploits: int = 2):
+    @profiled('network.init')
+    def __init__(self, num_computers: int, num_app_versions: int, compromised_sw: int, num_exploits: int = 2, seed: int = None,
+                 graph_model: str = "pairwise", edge_probability: float = 0.4, mean_degree: float = None, radius: float = None,
+                 graph_backend: str = "compact", num_vuls_per_type: int = 5, workers: int = None):
+        # Random stream of this network, the global random module unless a seed is given
+        self.rng = random.Random(seed) if seed is not None else random
+        # App graph generator: "pairwise" (one draw per pair), "gnp" (same distribution with geometric skips) or "spatial" (radius around each computer)
+        self.graph_model = graph_model
+        self.edge_probability = edge_probability
+        self.mean_degree = mean_degree
+        self.radius = radius
+        # App graph storage: "compact" (CSR arrays) or "networkx"
+        self.graph_backend = graph_backend
         self.num_computers = num_computers
         self.num_app_versions = num_app_versions
         self.num_exploits = num_exploits
+        # Vulnerability classes of each software type, type k owns the classes [k * num_vuls_per_type, (k + 1) * num_vuls_per_type)
+        self.num_vuls_per_type = num_vuls_per_type
         self.x_range = [0, 100]
         self.y_range = [0, 100]
-        self.os_versions = self.init_sw_versions("OS")
-        self.vulnerabilities = self.init_vulnerabilities(["OS", "APP1", "APP2"])
-        self.exploits = self.init_exploits(["OS", "APP1", "APP2"])
-        self.app1_versions = self.init_sw_versions("APP1", 1+num_app_versions)
-        self.app2_versions = self.init_sw_versions("APP2", 1+2*num_app_versions)
-        self.computers = self.init_computers()
-        self.graph = self.generate_graph()
-        self.init_compromised_sw(compromised_sw)
-        self.update_cc()
-        self.update_vc()
-        self.update_ic()
-
-    def init_sw_versions(self, sw_type: str, start_version: int = 1):
+        # Queues receiving the computers that become compromised, see subscribe
+        self.subscribers = []
+        self.dirty_computers = []
+        if seed is None and workers is None:
+            # Everything drawn in sequence from the global random stream, as the original construction
+            self.os_versions = self.init_sw_versions("OS")
+            self.vulnerabilities = self.init_vulnerabilities(["OS", "APP1", "APP2"])
+            self.exploits = self.init_exploits(["OS", "APP1", "APP2"])
+            self.app1_versions = self.init_sw_versions("APP1", 1+num_app_versions)
+            self.app2_versions = self.init_sw_versions("APP2", 1+2*num_app_versions)
+            self.update_exploitable()
+            self.computers = self.init_computers()
+            self.graph = self.generate_graph()
+            self.init_compromised_sw(compromised_sw)
+        else:
+            # With a seed the network only depends on the seed, however many workers build it
+            self.build_parts(compromised_sw, seed, workers or 1)
+        # Number of computers in each state (vulnerable, compromised, not vulnerable)
+        self.state_counts = self.count_states()
+        self.set_coverage()
+
+    def vulnerabilities_range(self, sw_type: str) -> range:
+        start = ["OS", "APP1", "APP2"].index(sw_type) * self.num_vuls_per_type
+        return range(start, start + self.num_vuls_per_type)
+
+    @profiled('network.init_sw_versions')
+    def init_sw_versions(self, sw_type: str, start_version: int = 1, rng: random.Random = None):
+        rng = rng or self.rng
         sw_versions = []
         for i in range(start_version, start_version + self.num_app_versions):
             # choose a random number of vulnerabilities for each implementation
-            if sw_type == "OS":
-                vulnerabilities_range = range(0, 5)
-            elif sw_type == "APP1":
-                vulnerabilities_range = range(5, 10)
-            elif sw_type == "APP2":
-                vulnerabilities_range = range(10, 15)
-            sw_versions.append(Implementation(sw_type, i, 15, random.sample(vulnerabilities_range, random.randint(1, len(vulnerabilities_range)))))
+            vulnerabilities_range = self.vulnerabilities_range(sw_type)
+            sw_versions.append(Implementation.intern(sw_type, i, 3 * self.num_vuls_per_type, rng.sample(vulnerabilities_range, rng.randint(1, len(vulnerabilities_range)))))
         return sw_versions
     
     def init_vulnerabilities(self, app_types: list[str]):
         vulnerabilities = []
         for app_type in app_types:
-            vulnerabilities.extend(f'{app_type}-VUL-{i}' for i in range(1, 6))
+            vulnerabilities.extend(f'{app_type}-VUL-{i}' for i in range(1, self.num_vuls_per_type + 1))
         return vulnerabilities
     
-    def init_exploits(self, sws_types: list[str]) -> dict[str, list[int]]:
+    def init_exploits(self, sws_types: list[str], rng: random.Random = None) -> dict[str, list[int]]:
+        rng = rng or self.rng
         exploits = {}
         for sw_type in sws_types:
-            if sw_type == "OS":
-                vulnerabilities_range = range(0, 5)
-            elif sw_type == "APP1":
-                vulnerabilities_range = range(5, 10)
-            elif sw_type == "APP2":
-                vulnerabilities_range = range(10, 15)
-            # Randomly select 2 vulnerabilities for each app type
-            exploits[sw_type] = random.sample(vulnerabilities_range, self.num_exploits)
+            vulnerabilities_range = self.vulnerabilities_range(sw_type)
+            # Randomly select num_exploits vulnerabilities for each app type
+            exploits[sw_type] = rng.sample(vulnerabilities_range, self.num_exploits)
         return exploits
 
+    def set_exploits(self, exploits: dict[str, list[int]]):
+        self.exploits = exploits
+        self.update_exploitable()
+
+    @profiled('network.update_exploitable')
+    def update_exploitable(self):
+        # Exploits of each type as a bitmask, and whether each implementation matches at least one of them
+        self.exploit_masks = {}
+        for sw_type, exploits in self.exploits.items():
+            exploit_mask = 0
+            for exploit in exploits:
+                exploit_mask |= 1 << exploit
+            self.exploit_masks[sw_type] = exploit_mask
+        self.exploitable = {}
+        for implementation in self.get_implementations():
+            self.exploitable[implementation] = implementation.vul_mask & self.exploit_masks[implementation.type] != 0
+
+    @profiled('network.init_computers')
     def init_computers(self) -> list[Computer]:
         computers = []
         for i in range(self.num_computers):
-            os = OperatingSystem(i, random.choice(self.os_versions))
+            os = OperatingSystem(i, self.rng.choice(self.os_versions))
 
             # Randomly create applications for each computer
             apps = []
-            if random.random() < 0.8:
-                apps.append(Application(i, random.choice(self.app1_versions)))
-            if random.random() < 0.6 or len(apps) == 0:
-                apps.append(Application(i, random.choice(self.app2_versions)))
-            computer = Computer(i, os, apps, random.uniform(self.x_range[0], self.x_range[1]), random.uniform(self.y_range[0], self.y_range[1]))        
+            if self.rng.random() < 0.8:
+                apps.append(Application(i, self.rng.choice(self.app1_versions)))
+            if self.rng.random() < 0.6 or len(apps) == 0:
+                apps.append(Application(i, self.rng.choice(self.app2_versions)))
+            computer = Computer(i, os, apps, self.rng.uniform(self.x_range[0], self.x_range[1]), self.rng.uniform(self.y_range[0], self.y_range[1]))        
+            computer.tracker = self.dirty_computers
             computers.append(computer)
         return computers
 
-    def init_compromised_sw(self, compromised_sw: int):
+    @profiled('network.init_compromised_sw')
+    def init_compromised_sw(self, compromised_sw: int, rng: random.Random = None):
         # Randomly set the compromised software
-        compromised_sw = random.sample(self.computers, compromised_sw)
+        rng = rng or self.rng
+        compromised_sw = rng.sample(self.computers, compromised_sw)
         for computer in compromised_sw:
             sws = [computer.os] + computer.apps
-            sw = random.choice(sws)
+            sw = rng.choice(sws)
             sw.state = 1
-            print(f'Computer{computer.id}: {sw.get_software_type()}_{sw.id} is compromised')
+            logger.debug('Computer%s: %s_%s is compromised', computer.id, sw.get_software_type(), sw.id)
         return
 
+    @profiled('network.build_parts')
+    def build_parts(self, compromised_sw: int, seed: int, workers: int):
+        # Build the network from independent parts, each drawing from its own stream derived from seed: the
+        # versions and exploits, the computers in chunks of ASSIGNMENT_CHUNK, the edges of each app graph and the
+        # compromised software. The network only depends on seed, not on workers. The app graphs are assembled
+        # from their edges on first use. Without a seed, one is drawn from the global random stream.
+        # With workers > 1 the chunks and the graph layers are drawn by threads, which only overlap the NumPy
+        # work (the assignment chunks, the gnp and spatial generators): the pairwise generator is pure Python and
+        # holds the GIL, so it gains nothing from more workers
+        if seed is None:
+            seed = self.rng.getrandbits(64)
+        part_seed = lambda *key: int(np.random.SeedSequence(seed, spawn_key=key).generate_state(1, dtype=np.uint64)[0])
+        versions_rng = random.Random(part_seed(PART_VERSIONS))
+        self.os_versions = self.init_sw_versions("OS", rng=versions_rng)
+        self.vulnerabilities = self.init_vulnerabilities(["OS", "APP1", "APP2"])
+        self.exploits = self.init_exploits(["OS", "APP1", "APP2"], rng=versions_rng)
+        self.app1_versions = self.init_sw_versions("APP1", 1+self.num_app_versions, rng=versions_rng)
+        self.app2_versions = self.init_sw_versions("APP2", 1+2*self.num_app_versions, rng=versions_rng)
+        self.update_exploitable()
+        chunks = [(start, min(start + ASSIGNMENT_CHUNK, self.num_computers), part_seed(PART_COMPUTERS, chunk))
+                  for chunk, start in enumerate(range(0, self.num_computers, ASSIGNMENT_CHUNK))]
+        # A single worker draws everything in this thread, without a pool
+        executor = ThreadPoolExecutor(max_workers=workers) if workers > 1 else None
+        try:
+            draw_chunk = lambda chunk: self.draw_assignment(*chunk)
+            parts = list(executor.map(draw_chunk, chunks)) if executor is not None else [draw_chunk(chunk) for chunk in chunks]
+            assignment = {key: np.concatenate([part[key] for part in parts]) for key in parts[0]} if parts else {}
+            layers = {}
+            for i, sw_type in enumerate(['APP1', 'APP2']):
+                hosts = np.flatnonzero(assignment[sw_type] >= 0) if assignment else np.zeros(0, dtype=np.int64)
+                points = np.stack([assignment['x'][hosts], assignment['y'][hosts]], axis=1) if assignment else np.zeros((0, 2))
+                layers[sw_type] = (len(hosts), points, random.Random(part_seed(PART_GRAPHS, i)))
+            if executor is not None:
+                # The graph layers are drawn while the computers are built
+                futures = {sw_type: executor.submit(self.draw_edges, *layer) for sw_type, layer in layers.items()}
+                self.computers = self.assemble_computers(assignment)
+                self.layer_edges = {sw_type: future.result() for sw_type, future in futures.items()}
+            else:
+                self.computers = self.assemble_computers(assignment)
+                self.layer_edges = {sw_type: self.draw_edges(*layer) for sw_type, layer in layers.items()}
+        finally:
+            if executor is not None:
+                executor.shutdown()
+        self._graph = None
+        self.init_compromised_sw(compromised_sw, random.Random(part_seed(PART_COMPROMISE)))
+
+    def draw_assignment(self, start: int, stop: int, seed: int) -> dict[str, np.ndarray]:
+        # Versions and positions of the computers [start, stop), same distribution as init_computers:
+        # an OS, APP1 with probability 0.8 and APP2 with probability 0.6 (always when there is no APP1).
+        # The apps hold the index of their version, -1 when the computer does not run them
+        rng = np.random.default_rng(seed)
+        count = stop - start
+        has_app1 = rng.random(count) < 0.8
+        has_app2 = (rng.random(count) < 0.6) | ~has_app1
+        return {
+            'OS': rng.integers(len(self.os_versions), size=count),
+            'APP1': np.where(has_app1, rng.integers(len(self.app1_versions), size=count), -1),
+            'APP2': np.where(has_app2, rng.integers(len(self.app2_versions), size=count), -1),
+            'x': rng.uniform(self.x_range[0], self.x_range[1], count),
+            'y': rng.uniform(self.y_range[0], self.y_range[1], count),
+        }
+
+    @profiled('network.init_computers')
+    def assemble_computers(self, assignment: dict[str, np.ndarray]) -> list[Computer]:
+        computers = []
+        if not assignment:
+            return computers
+        os_versions, app1_versions, app2_versions = self.os_versions, self.app1_versions, self.app2_versions
+        for i, (os_choice, app1, app2, x, y) in enumerate(zip(*(assignment[key].tolist() for key in ['OS', 'APP1', 'APP2', 'x', 'y']))):
+            apps = []
+            if app1 >= 0:
+                apps.append(Application(i, app1_versions[app1]))
+            if app2 >= 0:
+                apps.append(Application(i, app2_versions[app2]))
+            computer = Computer(i, OperatingSystem(i, os_versions[os_choice]), apps, x, y)
+            computer.tracker = self.dirty_computers
+            computers.append(computer)
+        return computers
+
+    @property
+    def graph(self) -> dict:
+        # App graphs, assembled from the drawn edges on first use when the network was built in parts
+        if self._graph is None:
+            self._graph = {sw_type: self.layer_graph(self.layer_nodes(sw_type), edges) for sw_type, edges in self.layer_edges.items()}
+            self.layer_edges = None
+        return self._graph
+
+    @graph.setter
+    def graph(self, graph: dict):
+        self._graph = graph
+        self.layer_edges = None
+
+    def layer_nodes(self, sw_type: str) -> list[Application]:
+        return [app for computer in self.computers for app in computer.apps if app.get_software_type() == sw_type]
+
+    @profiled('network.generate_graph')
     def generate_graph(self) -> dict:
         graphs = {}
-        graph1, graph2 = nx.Graph(), nx.Graph()
-        for computer in self.computers:
-            for app in computer.apps:
-                if app.get_software_type() == 'APP1':
-                    graph1.add_node(app)
-                elif app.get_software_type() == 'APP2':
-                    graph2.add_node(app)
-        # Connect nodes with a probability of 0.4 in the same app graph
-        for application1, application2 in itertools.combinations(graph1.nodes(), 2):
-            if random.random() < 0.4:
-                graph1.add_edge(application1, application2)
-        for application1, application2 in itertools.combinations(graph2.nodes(), 2):
-            if random.random() < 0.4:
-                graph2.add_edge(application1, application2)
-        graphs['APP1'] = graph1
-        graphs['APP2'] = graph2
+        for sw_type in ['APP1', 'APP2']:
+            nodes = self.layer_nodes(sw_type)
+            graphs[sw_type] = self.layer_graph(nodes, self.generate_edges(nodes))
         return graphs
 
+    def layer_graph(self, nodes: list[Application], edges: np.ndarray):
+        if self.graph_backend.lower() == "networkx":
+            import networkx as nx
+            graph = nx.Graph()
+            graph.add_nodes_from(nodes)
+            graph.add_edges_from((nodes[i], nodes[j]) for i, j in edges.tolist())
+            return graph
+        return CompactGraph(nodes, edges)
+
+    def to_networkx(self) -> dict:
+        # networkx copies of the app graphs, for plotting and ad-hoc analysis
+        return {sw_type: graph if not isinstance(graph, CompactGraph) else graph.to_networkx() for sw_type, graph in self.graph.items()}
+
+    def generate_edges(self, nodes: list[Application]) -> np.ndarray:
+        # Edges between the nodes of one app graph, as pairs of node indices
+        points = None
+        if self.graph_model.lower() == "spatial":
+            points = np.array([(self.computers[node.id].x_position, self.computers[node.id].y_position) for node in nodes], dtype=float).reshape(-1, 2)
+        return self.draw_edges(len(nodes), points, self.rng)
+
+    def draw_edges(self, num_nodes: int, points: np.ndarray, rng: random.Random) -> np.ndarray:
+        p = self.edge_probability
+        if self.mean_degree is not None and num_nodes > 1:
+            p = min(1.0, self.mean_degree / (num_nodes - 1))
+        if self.graph_model.lower() == "pairwise":
+            return generators.pairwise_edges(num_nodes, p, rng)
+        elif self.graph_model.lower() == "gnp":
+            return generators.gnp_edges(num_nodes, p, rng)
+        elif self.graph_model.lower() == "spatial":
+            radius = self.radius
+            if radius is None:
+                area = (self.x_range[1] - self.x_range[0]) * (self.y_range[1] - self.y_range[0])
+                radius = generators.radius_for_mean_degree(num_nodes, p * (num_nodes - 1), area)
+            return generators.spatial_edges(points, radius)
+        raise ValueError(f"Unknown graph model: {self.graph_model}")
+
+    def fork(self, seed: int = None) -> 'Network':
+        # Copy sharing the implementations, exploits, positions and graph structure, with its own software state.
+        # The fork continues the random stream of this network unless a seed is given
+        network = copy.copy(self)
+        if seed is not None:
+            network.rng = random.Random(seed)
+        else:
+            network.rng = random.Random()
+            network.rng.setstate(self.rng.getstate())
+        network.subscribers = []
+        network.dirty_computers = []
+        network.computers = []
+        mapping = {}
+        for computer in self.computers:
+            fork_computer = computer.copy()
+            fork_computer.tracker = network.dirty_computers
+            if computer.dirty:
+                fork_computer.mark_dirty()
+            for sw, fork_sw in zip([computer.os] + computer.apps, [fork_computer.os] + fork_computer.apps):
+                mapping[sw] = fork_sw
+            network.computers.append(fork_computer)
+        network.graph = {}
+        for sw_type, graph in self.graph.items():
+            if isinstance(graph, CompactGraph):
+                network.graph[sw_type] = CompactGraph.from_csr([mapping[node] for node in graph.nodes()], graph.indptr, graph.indices)
+            else:
+                import networkx as nx
+                network.graph[sw_type] = nx.relabel_nodes(graph, mapping)
+        network.state_counts = list(self.state_counts)
+        return network
+
+    def get_implementations(self) -> list[Implementation]:
+        return self.os_versions + self.app1_versions + self.app2_versions
+
+    def get_softwares(self) -> list[Software]:
+        # All the software, computer by computer, OS first
+        return [sw for computer in self.computers for sw in [computer.os] + computer.apps]
+
+    def snapshot(self) -> dict:
+        # Mutable state of the network: software state, attack phase and implementation, computer state and random stream
+        implementation_index = {implementation: i for i, implementation in enumerate(self.get_implementations())}
+        softwares = self.get_softwares()
+        return {
+            'state': np.array([sw.state for sw in softwares], dtype=np.int8),
+            'attack_phase': np.array([sw.attack_phase for sw in softwares], dtype=np.int8),
+            'implementation': np.array([implementation_index[sw.implementation] for sw in softwares], dtype=np.int32),
+            'computer_state': np.array([computer.state for computer in self.computers], dtype=np.int8),
+            'dirty': np.array([computer.dirty for computer in self.computers], dtype=bool),
+            'rng_state': self.rng.getstate(),
+        }
+
+    def restore(self, snapshot: dict):
+        # Return to a state taken by snapshot on this network (or one of its forks)
+        implementations = self.get_implementations()
+        for i, sw in enumerate(self.get_softwares()):
+            sw.implementation = implementations[snapshot['implementation'][i]]
+            sw.state = int(snapshot['state'][i])
+            sw.attack_phase = int(snapshot['attack_phase'][i])
+        for i, computer in enumerate(self.computers):
+            computer.state = int(snapshot['computer_state'][i])
+        self.rng.setstate(snapshot['rng_state'])
+        self.recount_coverage()
+        for i in np.flatnonzero(snapshot['dirty']):
+            self.computers[i].mark_dirty()
+
+    def save(self, path: str):
+        from .storage import save_network
+        save_network(self, path)
+
+    @staticmethod
+    def load(path: str, mmap: bool = True) -> 'Network':
+        from .storage import load_network
+        return load_network(path, mmap)
+
     def print_diversity_configurations(self):
         # Print the diversity configurations for each computer
         for computer in self.computers:
@@ -148,9 +413,9 @@ class Network:
             print(f'Computer{computer.id}: S\'t={computer.state}')
 
     def get_computer(self, id: int) -> Computer:
-        for computer in self.computers:
-            if computer.id == id:
-                return computer
+        # Computers are stored at the position of their id
+        if 0 <= id < len(self.computers):
+            return self.computers[id]
         return None
 
     def get_connected_apps(self):
@@ -176,14 +441,71 @@ class Network:
         if sw_type == 'OS':
             return connected_software
         connected_software.append(computer.os)
-        app_graph = self.graph[sw_type]
-        for edge in app_graph.edges():
-            if edge[0] == software:
-                connected_software.append(edge[1])
-            elif edge[1] == software:
-                connected_software.append(edge[0])
+        connected_software.extend(self.graph[sw_type].neighbors(software))
         return connected_software
     
+    def count_states(self) -> list[int]:
+        counts = [0, 0, 0]
+        for computer in self.computers:
+            counts[computer.state] += 1
+        return counts
+
+    def set_coverage(self):
+        # Vulnerability, connectivity and integrity coverage from the state counts
+        self.vc = self.state_counts[0] / self.num_computers
+        self.cc = self.state_counts[1] / self.num_computers
+        self.ic = self.state_counts[2] / self.num_computers
+
+    @profiled('network.update_coverage')
+    def update_coverage(self):
+        # Re-evaluate only the computers whose software changed state since the last update
+        compromised = []
+        profiler.count('network.recomputed_computers', len(self.dirty_computers))
+        for computer in self.dirty_computers:
+            computer.dirty = False
+            old_state = computer.state
+            computer.update_state()
+            if computer.state != old_state:
+                self.state_counts[old_state] -= 1
+                self.state_counts[computer.state] += 1
+                if computer.state == 1:
+                    compromised.append(computer)
+        self.dirty_computers.clear()
+        profiler.count('network.compromise_events', len(compromised))
+        # Publish in id order so the events do not depend on the order the software changed
+        for computer in sorted(compromised, key=lambda computer: computer.id):
+            self.publish(computer)
+        self.set_coverage()
+
+    def subscribe(self) -> deque:
+        # Queue that receives every computer becoming compromised from now on, until it is passed to
+        # unsubscribe. Only a weak reference is kept, a queue dropped by its subscriber stops receiving events
+        events = deque()
+        self.subscribers.append(weakref.ref(events))
+        return events
+
+    def unsubscribe(self, events: deque):
+        self.subscribers = [ref for ref in self.subscribers if ref() is not None and ref() is not events]
+
+    def publish(self, computer: Computer):
+        released = False
+        for ref in self.subscribers:
+            events = ref()
+            if events is None:
+                released = True
+            else:
+                events.append(computer)
+        if released:
+            self.subscribers = [ref for ref in self.subscribers if ref() is not None]
+
+    def recount_coverage(self):
+        # Full rescan, for when computer states were written directly
+        for computer in self.dirty_computers:
+            computer.dirty = False
+        self.dirty_computers.clear()
+        self.state_counts = self.count_states()
+        self.set_coverage()
+
     def update_vc(self):
         # Calculate the vulnerability coverage
         vc = 0
@@ -0,0 +1,121 @@
+import os
+import json
+import time
+import functools
+import threading
+from contextlib import nullcontext
+
+# Shared context manager returned by Profiler.span when profiling is disabled
+NULL_SPAN = nullcontext()
+
+
+class Span:
+    __slots__ = ('profiler', 'name', 'start')
+
+    def __init__(self, profiler: 'Profiler', name: str):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.record(self.name, self.start, time.perf_counter_ns() - self.start)
+        return False
+
+
+# Wall time and call count of named spans, plus named work counters.
+# Disabled by default: span returns a shared no-op context manager and count returns at once
+class Profiler:
+    def __init__(self, max_events: int = 1_000_000):
+        self.enabled = False
+        # Individual spans kept for the trace, the totals keep counting past max_events
+        self.max_events = max_events
+        self.reset()
+
+    def reset(self):
+        # Span name -> [calls, total ns]
+        self.spans = {}
+        self.counters = {}
+        # Trace events as (name, start ns, duration ns, thread id)
+        self.events = []
+        self.origin = time.perf_counter_ns()
+
+    def enable(self, reset: bool = True):
+        if reset:
+            self.reset()
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def __enter__(self):
+        self.enable()
+        return self
+
+    def __exit__(self, *exc):
+        self.disable()
+        return False
+
+    def span(self, name: str):
+        if not self.enabled:
+            return NULL_SPAN
+        return Span(self, name)
+
+    def record(self, name: str, start: int, duration: int):
+        totals = self.spans.get(name)
+        if totals is None:
+            totals = self.spans[name] = [0, 0]
+        totals[0] += 1
+        totals[1] += duration
+        if len(self.events) < self.max_events:
+            self.events.append((name, start, duration, threading.get_ident()))
+
+    def count(self, name: str, value: int = 1):
+        if not self.enabled:
+            return
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def summary(self) -> str:
+        # Spans sorted by total time, then the counters
+        lines = [f"{'span':<40} {'calls':>8} {'total ms':>10} {'mean us':>10}"]
+        for name, (calls, total) in sorted(self.spans.items(), key=lambda item: -item[1][1]):
+            lines.append(f"{name:<40} {calls:>8} {total / 1e6:>10.2f} {total / calls / 1e3:>10.2f}")
+        if self.counters:
+            lines.append("")
+            lines.append(f"{'counter':<40} {'value':>8}")
+            for name, value in sorted(self.counters.items()):
+                lines.append(f"{name:<40} {value:>8}")
+        return "\n".join(lines)
+
+    def trace(self) -> dict:
+        # Chrome trace event format, opens in chrome://tracing, Perfetto and speedscope
+        pid = os.getpid()
+        events = [{'name': name, 'cat': name.split('.')[0], 'ph': 'X', 'ts': (start - self.origin) / 1e3, 'dur': duration / 1e3, 'pid': pid, 'tid': tid}
+                  for name, start, duration, tid in self.events]
+        end = max((start + duration for _, start, duration, _ in self.events), default=self.origin)
+        for name, value in sorted(self.counters.items()):
+            events.append({'name': name, 'ph': 'C', 'ts': (end - self.origin) / 1e3, 'pid': pid, 'args': {'value': value}})
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def save_trace(self, path: str):
+        with open(path, 'w') as f:
+            json.dump(self.trace(), f)
+
+
+# Process wide profiler used by the models and the simulation
+profiler = Profiler()
+
+
+def profiled(name: str):
+    # Decorator timing every call of a function as a span of the shared profiler
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not profiler.enabled:
+                return function(*args, **kwargs)
+            with Span(profiler, name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -1,23 +1,49 @@
-import random
+import copy
+import logging
+import weakref
+
+logger = logging.getLogger(__name__)
 
 class Implementation:
+    # Implementations are immutable and shared, see Implementation.intern
+    __slots__ = ('type', 'implementation_type', 'num_vuls', 'vul_mask', '__weakref__')
+    interned = weakref.WeakValueDictionary()
+
     def __init__(self, type: str, implementation_type: int, num_vuls: int, vulnerabilities: list[int] = []):
         # Software type (OS, App1, App2, etc.)
         self.type = type
         # Implementation type, e.g., Windows, Linux, Mac for OS etc. using numbers for simplicity
         self.implementation_type = implementation_type
-        self.vuls = self.generate_vuls(vulnerabilities, num_vuls)
-        print(f'Implementation {self.implementation_type}: {self.vuls}')
+        self.num_vuls = num_vuls
+        # Bit i is set when the implementation has vulnerability i
+        self.vul_mask = self.generate_vul_mask(vulnerabilities)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug('Implementation %s: %s', self.implementation_type, self.vuls)
+
+    @classmethod
+    def intern(cls, type: str, implementation_type: int, num_vuls: int, vulnerabilities: list[int] = []) -> 'Implementation':
+        # Return the shared instance for these parameters, creating it the first time
+        key = (type, implementation_type, num_vuls, cls.generate_vul_mask(vulnerabilities))
+        implementation = cls.interned.get(key)
+        if implementation is None:
+            implementation = cls(type, implementation_type, num_vuls, vulnerabilities)
+            cls.interned[key] = implementation
+        return implementation
 
-    def generate_vuls(self, vulnerabilities: list[int], num_vuls: int):
-        # vuls is a list 0 and 1 where 0 means no vulnerability and 1 means vulnerability
-        vuls = [0] * num_vuls
+    @staticmethod
+    def generate_vul_mask(vulnerabilities: list[int]) -> int:
+        vul_mask = 0
         for vul in vulnerabilities:
-            vuls[vul] = 1
-        return vuls        
+            vul_mask |= 1 << vul
+        return vul_mask
 
-    def set_vulnerabilities(self, vulnerabilities: list[int]):
-        self.vuls = vulnerabilities
+    @property
+    def vuls(self) -> tuple[int, ...]:
+        # vuls is a vector of 0 and 1 where 0 means no vulnerability and 1 means vulnerability
+        return tuple((self.vul_mask >> vul) & 1 for vul in range(self.num_vuls))
+
+    def is_vulnerable(self) -> bool:
+        return self.vul_mask != 0
 
     def __str__(self):
         return f'{self.type} with implementation {self.implementation_type}'
@@ -26,17 +52,34 @@ class Implementation:
         return self.vuls
 
 class Software:
+    __slots__ = ('id', 'implementation', 'host', '_state', 'attack_phase')
+
     def __init__(self, id: int, implementation: Implementation):
         # Unique identifier
         self.id = id
         self.implementation= implementation
+        # Computer hosting the software, notified of state changes
+        self.host = None
         # Vulnerabilities (0: vulnerable, 1: compromised, 2: not vulnerable)
-        self.state = self.init_state()
+        self._state = self.init_state()
         self.attack_phase = -1 # -1: not attacked, 0: installation, 1: discovery, 2: privilege escalation, 3: lateral movement
 
+    @property
+    def state(self) -> int:
+        return self._state
+
+    @state.setter
+    def state(self, state: int):
+        if state == self._state:
+            return
+        self._state = state
+        # Let the host re-evaluate its state at the next coverage update
+        if self.host is not None:
+            self.host.mark_dirty()
+
     def init_state(self):
         # Calculate the state based on the vulnerabilities
-        if 1 in self.implementation.vuls:
+        if self.implementation.is_vulnerable():
             # If there are vulnerabilities, set the state to 0 (vulnerable)
             return 0
         return 2
@@ -46,7 +89,7 @@ class Software:
         if self.state == 1:
             return
         # If there are vulnerabilities, set the state to 0 (vulnerable)
-        self.state = 0 if len(self.implementation.vuls) > 0 else 2
+        self.state = 0 if self.implementation.is_vulnerable() else 2
 
     def set_attack_phase(self, phase: int):
         self.attack_phase = phase
@@ -62,16 +105,26 @@ class Software:
 
     def __str__(self):
         return f'{self.implementation.type}_{self.id}'
+
+    def copy(self) -> 'Software':
+        # Same implementation, state and attack phase, not attached to any computer
+        software = copy.copy(self)
+        software.host = None
+        return software
     
     def update_implementation(self, implementation: Implementation):
         self.implementation = implementation
         self.set_state_based_on_vulnerabilities()
 
 class OperatingSystem(Software):
+    __slots__ = ()
+
     def __init__(self, id: int, implementation: Implementation):
         super().__init__(id, implementation)
 
 
 class Application(Software):
+    __slots__ = ()
+
     def __init__(self, id: int, implementation: Implementation):
         super().__init__(id, implementation)
@@ -0,0 +1,103 @@
+import os
+import json
+import random
+
+import numpy as np
+
+from .software import OperatingSystem, Application, Implementation
+from .network import Computer, Network
+from .graph import CompactGraph
+from .engine import SOFTWARE_TYPES
+
+NETWORK_CONFIG = ['num_computers', 'num_app_versions', 'num_exploits', 'graph_model', 'edge_probability', 'mean_degree', 'radius',
+                  'graph_backend', 'x_range', 'y_range', 'vulnerabilities', 'exploits', 'num_vuls_per_type']
+
+
+def save_network(network: Network, path: str):
+    # Save a generated network as a directory of .npy arrays plus a meta.json, loadable with memory mapping
+    os.makedirs(path, exist_ok=True)
+    implementations = network.get_implementations()
+    softwares = network.get_softwares()
+    snapshot = network.snapshot()
+    version, internal_state, gauss = snapshot['rng_state']
+    meta = {name: getattr(network, name) for name in NETWORK_CONFIG}
+    meta['implementations'] = [[implementation.type, implementation.implementation_type] for implementation in implementations]
+    meta['num_versions'] = [len(network.os_versions), len(network.app1_versions), len(network.app2_versions)]
+    meta['rng_state'] = [version, list(internal_state), gauss]
+    arrays = {
+        'vuls': np.array([implementation.vuls for implementation in implementations], dtype=np.int8),
+        'x_position': np.array([computer.x_position for computer in network.computers], dtype=float),
+        'y_position': np.array([computer.y_position for computer in network.computers], dtype=float),
+        'host': np.array([sw.id for sw in softwares], dtype=np.int64),
+        'sw_type': np.array([SOFTWARE_TYPES.index(sw.get_software_type()) for sw in softwares], dtype=np.int8),
+        'computer_state': snapshot['computer_state'],
+        'dirty': snapshot['dirty'],
+        'state': snapshot['state'],
+        'attack_phase': snapshot['attack_phase'],
+        'implementation': snapshot['implementation'],
+    }
+    for sw_type, graph in network.graph.items():
+        if not isinstance(graph, CompactGraph):
+            index = {node: i for i, node in enumerate(graph.nodes())}
+            graph = CompactGraph(list(graph.nodes()), [(index[u], index[v]) for u, v in graph.edges()])
+        arrays[f'{sw_type}_indptr'] = graph.indptr
+        arrays[f'{sw_type}_indices'] = graph.indices
+    for name, array in arrays.items():
+        np.save(os.path.join(path, f'{name}.npy'), array)
+    with open(os.path.join(path, 'meta.json'), 'w') as f:
+        json.dump(meta, f)
+
+
+def load_network(path: str, mmap: bool = True) -> Network:
+    # Rebuild a network saved by save_network, the graph arrays stay memory mapped when mmap is set
+    with open(os.path.join(path, 'meta.json')) as f:
+        meta = json.load(f)
+    mmap_mode = 'r' if mmap else None
+    arrays = {name[:-len('.npy')]: np.load(os.path.join(path, name), mmap_mode=mmap_mode) for name in os.listdir(path) if name.endswith('.npy')}
+    network = Network.__new__(Network)
+    for name in NETWORK_CONFIG:
+        setattr(network, name, meta[name])
+    version, internal_state, gauss = meta['rng_state']
+    network.rng = random.Random()
+    network.rng.setstate((version, tuple(internal_state), gauss))
+    # Implementations
+    implementations = []
+    for (sw_type, implementation_type), vuls in zip(meta['implementations'], np.asarray(arrays['vuls'])):
+        implementations.append(Implementation.intern(sw_type, implementation_type, len(vuls), np.flatnonzero(vuls).tolist()))
+    num_os, num_app1, _ = meta['num_versions']
+    network.os_versions = implementations[:num_os]
+    network.app1_versions = implementations[num_os:num_os + num_app1]
+    network.app2_versions = implementations[num_os + num_app1:]
+    network.update_exploitable()
+    # Software and computers
+    host = np.asarray(arrays['host']).tolist()
+    sw_type = np.asarray(arrays['sw_type']).tolist()
+    state = np.asarray(arrays['state']).tolist()
+    attack_phase = np.asarray(arrays['attack_phase']).tolist()
+    implementation = np.asarray(arrays['implementation']).tolist()
+    softwares = [[] for _ in range(network.num_computers)]
+    for i in range(len(host)):
+        software_class = OperatingSystem if sw_type[i] == 0 else Application
+        sw = software_class(host[i], implementations[implementation[i]])
+        sw.state = state[i]
+        sw.attack_phase = attack_phase[i]
+        softwares[host[i]].append(sw)
+    network.subscribers = []
+    network.dirty_computers = []
+    network.computers = []
+    for i, sws in enumerate(softwares):
+        computer = Computer(i, sws[0], sws[1:], float(arrays['x_position'][i]), float(arrays['y_position'][i]))
+        computer.state = int(arrays['computer_state'][i])
+        computer.tracker = network.dirty_computers
+        network.computers.append(computer)
+    # Graphs, nodes are the apps of each type in computer order as in Network.generate_graph
+    network.graph = {}
+    for sw_type in ['APP1', 'APP2']:
+        nodes = [app for computer in network.computers for app in computer.apps if app.get_software_type() == sw_type]
+        graph = CompactGraph.from_csr(nodes, arrays[f'{sw_type}_indptr'], arrays[f'{sw_type}_indices'])
+        network.graph[sw_type] = graph.to_networkx() if network.graph_backend.lower() == "networkx" else graph
+    network.state_counts = network.count_states()
+    network.set_coverage()
+    for i in np.flatnonzero(arrays['dirty']):
+        network.computers[i].mark_dirty()
+    return network
@@ -0,0 +1,60 @@
+import numpy as np
+
+# Columns recorded for every time step
+TRAJECTORY_COLUMNS = {
+    't': np.int32,
+    'vc': np.float64,
+    'cc': np.float64,
+    'ic': np.float64,
+    'phase_0': np.int64,
+    'phase_1': np.int64,
+    'phase_2': np.int64,
+    'phase_3': np.int64,
+    'phase_4': np.int64,
+    'phase_5': np.int64,
+    'actions': np.int64,
+}
+
+
+# Per step metrics of a simulation stored as preallocated columns
+class TrajectoryRecorder:
+    def __init__(self, capacity: int = 64):
+        self.length = 0
+        self.columns = {name: np.zeros(max(capacity, 1), dtype=dtype) for name, dtype in TRAJECTORY_COLUMNS.items()}
+
+    def __len__(self):
+        return self.length
+
+    def append(self, metrics: dict):
+        if self.length == len(self.columns['t']):
+            # Double the capacity when full
+            for name, column in self.columns.items():
+                self.columns[name] = np.concatenate([column, np.zeros_like(column)])
+        row = {'t': metrics['t'], 'vc': metrics['vc'], 'cc': metrics['cc'], 'ic': metrics['ic'], 'actions': metrics['actions']}
+        for phase, count in enumerate(metrics['phases']):
+            row[f'phase_{phase}'] = count
+        for name, value in row.items():
+            self.columns[name][self.length] = value
+        self.length += 1
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.columns[name][:self.length]
+
+    def tts(self, taus: list[float]) -> list[int]:
+        # First recorded step at which cc reached each tau, None if it never did
+        peak = np.maximum.accumulate(self['cc'])
+        index = np.searchsorted(peak, np.asarray(taus, dtype=float), side='left')
+        steps = self['t']
+        return [int(steps[i]) if i < self.length else None for i in index.tolist()]
+
+    def save(self, path: str):
+        np.savez_compressed(path, **{name: self[name] for name in self.columns})
+
+    @classmethod
+    def load(cls, path: str) -> 'TrajectoryRecorder':
+        with np.load(path) as data:
+            recorder = cls(len(data['t']))
+            for name in TRAJECTORY_COLUMNS:
+                recorder.columns[name][:len(data[name])] = data[name]
+            recorder.length = len(data['t'])
+        return recorder
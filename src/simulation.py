@@ -1,25 +1,76 @@
-from .models import Network, Attacker, Defender
+from .models import Network, Attacker, Defender, NetworkArrays, ArrayAttacker, ArrayDefender, profiler, profiled
+from .recorder import TrajectoryRecorder
 
 class Simulation:
-    def __init__(self, network: Network, d_strategy: str, d_algorithm: str):
+    def __init__(self, network: Network, d_strategy: str, d_algorithm: str, engine: str = "object", response_latency: int = 0, budget: int = None):
         self.network = network
-        self.attacker = Attacker(self.network)
-        self.defender = Defender(self.network, d_strategy, d_algorithm)
-        self.tau_index = 0
+        # Engine: "object" walks the Software objects, "array" runs on NetworkArrays
+        self.engine = engine
+        if engine.lower() == "array":
+            self.arrays = NetworkArrays(self.network)
+            self.attacker = ArrayAttacker(self.network, self.arrays)
+            self.defender = ArrayDefender(self.network, d_strategy, d_algorithm, self.arrays, response_latency, budget)
+        else:
+            self.arrays = None
+            self.attacker = Attacker(self.network)
+            self.defender = Defender(self.network, d_strategy, d_algorithm, response_latency, budget)
+        self.t = 0
+        self.recorder = None
         self.tts_list = []
 
-    def run(self, time_steps: int, taus: list[float]) -> tuple[list[float], list[int]]:
-        for t in range(time_steps):
+    def steps(self, time_steps: int):
+        # Run time_steps steps, yielding the metrics of each one
+        for _ in range(time_steps):
             self.attacker.attack()
             self.defender.defend()
-            print(f"At time {t}, {self.net_info()}")
-            if self.tau_index == len(taus):
+            metrics = {
+                't': self.t,
+                'vc': self.network.vc,
+                'cc': self.network.cc,
+                'ic': self.network.ic,
+                'phases': self.attacker.phase_counts(),
+                'actions': self.defender.actions,
+            }
+            self.t += 1
+            yield metrics
+
+    @profiled('simulation.run')
+    def run(self, time_steps: int, taus: list[float], verbose: bool = True, truncate: bool = False) -> tuple[list[float], list[int]]:
+        # Record every step, stopping one step after the highest tau has been reached.
+        # With truncate, also stop once the attacker is exhausted: the compromised coverage cannot grow any more
+        self.recorder = TrajectoryRecorder(time_steps)
+        target = max(taus, default=0.0)
+        reached = len(taus) == 0
+        for metrics in self.steps(time_steps):
+            with profiler.span('simulation.record'):
+                self.recorder.append(metrics)
+            if verbose:
+                with profiler.span('simulation.print'):
+                    print(f"At time {metrics['t']}, {self.net_info()}")
+            if reached or truncate and self.attacker.exhausted():
                 break
-            while self.tau_index < len(taus) and self.network.cc >= taus[self.tau_index]:
-                self.tts_list.append(t)
-                self.tau_index += 1
-        taus = taus[:len(self.tts_list)]
+            reached = metrics['cc'] >= target
+        with profiler.span('simulation.sync_network'):
+            self.sync_network()
+        tts_list = self.recorder.tts(taus)
+        taus = [tau for tau, tts in zip(taus, tts_list) if tts is not None]
+        self.tts_list = [tts for tts in tts_list if tts is not None]
         return taus, self.tts_list
+
+    def close(self):
+        # Release the network resources held by the defender, before another simulation runs on the same network
+        self.defender.close()
+
+    def __enter__(self) -> 'Simulation':
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def sync_network(self):
+        # Write the array engine state back to the network objects
+        if self.arrays is not None:
+            self.arrays.sync_to_network()
     
     def net_info(self):
         return f"VC: {self.network.vc}; CC: {self.network.cc}; IC: {self.network.ic}"
\ No newline at end of file
@@ -0,0 +1,221 @@
+import time
+import math
+import itertools
+
+import numpy as np
+
+from .models import Network, SOFTWARE_TYPES, layer_csr
+from .simulation import Simulation
+from .ensemble import EnsembleResult, replica_seed
+
+# Steps of one attacker cycle (installation, discovery, privilege escalation, lateral movement, causing damages)
+CYCLE = 5
+
+
+# Status of the software of each type on a computer
+ABSENT, SAFE, UNTOUCHED, INSTALLED, COMPROMISED = range(5)
+
+
+# Deterministic mean-field estimate of the attack on a network. Every computer is described by the status
+# of its OS, APP1 and APP2 (absent, not exploitable, exploitable and untouched, installed in the current
+# attacker cycle or compromised earlier) and the surrogate propagates the distribution of these statuses
+# over the computers, once per attacker cycle: an untouched software is installed when another software of
+# its computer, or for an app one of its app graph neighbours, was installed in the previous cycle. The app
+# graphs enter through their degree distributions, assuming they are locally tree-like.
+class MeanFieldSurrogate:
+    def __init__(self, network: Network, d_strategy: str = "Static", proportion: float = 0.5):
+        if d_strategy.lower() not in ("static", "proactive"):
+            raise ValueError(f"The surrogate models the Static and Proactive strategies, not {d_strategy}")
+        self.num_computers = network.num_computers
+        self.d_strategy = d_strategy
+        # Fraction of the computers re-implemented every cycle by the proactive defender
+        self.proportion = proportion if d_strategy.lower() == "proactive" else 0.0
+        # Fraction of the versions of each type that is exploitable, the chance of a redrawn software to be exploitable
+        versions = [network.os_versions, network.app1_versions, network.app2_versions]
+        self.version_exploitable = np.array([np.mean([network.exploitable[implementation] for implementation in layer_versions]) for layer_versions in versions])
+        # Degree distribution of each app graph, the OS layer has no graph
+        self.degree_distributions = {}
+        for sw_type, graph in network.graph.items():
+            degrees = np.diff(layer_csr(graph)[0])
+            self.degree_distributions[sw_type] = np.bincount(degrees) / max(len(degrees), 1)
+        # Remaining degree of the app at the end of an edge, leaving the edge out
+        self.excess_distributions = {}
+        for sw_type, distribution in self.degree_distributions.items():
+            weighted = np.arange(len(distribution)) * distribution
+            self.excess_distributions[sw_type] = weighted[1:] / weighted.sum() if weighted.sum() else np.ones(1)
+        # Every combination of statuses of the OS, APP1 and APP2 of a computer, one row per combination
+        self.statuses = np.array(list(itertools.product(range(COMPROMISED + 1), repeat=len(SOFTWARE_TYPES))), dtype=np.int64)
+        # Initial distribution of the computers over the combinations, the compromised software is installed on the first step
+        indices = []
+        for computer in network.computers:
+            status = [ABSENT] * len(SOFTWARE_TYPES)
+            for sw in [computer.os] + computer.apps:
+                if sw.state == 1:
+                    value = INSTALLED
+                else:
+                    value = UNTOUCHED if network.exploitable[sw.implementation] else SAFE
+                status[SOFTWARE_TYPES.index(sw.get_software_type())] = value
+            indices.append(self.status_index(status))
+        self.computers = np.bincount(indices, minlength=len(self.statuses)) / network.num_computers
+        self.init_transitions()
+
+    def status_index(self, status) -> int:
+        index = 0
+        for value in status:
+            index = index * (COMPROMISED + 1) + value
+        return index
+
+    def init_transitions(self):
+        # Within a computer every software reaches all the others, so an untouched software is installed when
+        # another software of its computer was installed in the previous cycle, or, for an app, when its app
+        # graph neighbours reach it. The layer outcome of the apps is enumerated: transitions[s, h] is the
+        # next combination of combination s when the apps in hit pattern h are reached through their graphs
+        statuses = self.statuses
+        installed = statuses == INSTALLED
+        self.host_reach = (installed.sum(axis=1, keepdims=True) - installed) > 0
+        self.apps = [i for i, sw_type in enumerate(SOFTWARE_TYPES) if sw_type in self.degree_distributions]
+        self.hit_patterns = np.array(list(itertools.product([False, True], repeat=len(self.apps))), dtype=bool).reshape(-1, len(self.apps))
+        self.transitions = np.zeros((len(statuses), len(self.hit_patterns)), dtype=np.int64)
+        for h, pattern in enumerate(self.hit_patterns):
+            hit = np.zeros(statuses.shape, dtype=bool)
+            hit[:, self.apps] = pattern
+            next_statuses = np.where(installed, COMPROMISED, statuses)
+            next_statuses = np.where((statuses == UNTOUCHED) & (self.host_reach | hit), INSTALLED, next_statuses)
+            self.transitions[:, h] = next_statuses @ (COMPROMISED + 1) ** np.arange(len(SOFTWARE_TYPES))[::-1]
+        # Redraw of the implementations by the defender, one kernel per software type over the statuses
+        self.redraw_kernels = []
+        for exploitable in self.version_exploitable:
+            kernel = np.eye(COMPROMISED + 1)
+            kernel[[SAFE, UNTOUCHED]] = 0.0
+            kernel[[SAFE, UNTOUCHED], SAFE] = 1 - exploitable
+            kernel[[SAFE, UNTOUCHED], UNTOUCHED] = exploitable
+            self.redraw_kernels.append(kernel)
+
+    def no_layer_neighbour(self, sw_type: str, installed: float, excess: bool = False) -> float:
+        # Probability that none of the app graph neighbours of a software was installed: the generating function
+        # of the degree distribution at 1 - installed. With excess, the neighbour the software was reached
+        # through is left out, using the distribution of the remaining degree of an edge end
+        distributions = self.excess_distributions if excess else self.degree_distributions
+        distribution = distributions.get(sw_type)
+        if distribution is None:
+            return 1.0
+        return float(distribution @ (1.0 - installed) ** np.arange(len(distribution)))
+
+    def redraw(self, computers: np.ndarray) -> np.ndarray:
+        # The proactive defender redraws the implementations of a proportion of the computers, the software
+        # that is not compromised becomes exploitable or not independently
+        size = COMPROMISED + 1
+        redrawn = computers.reshape(size, size, size)
+        for axis, kernel in enumerate(self.redraw_kernels):
+            redrawn = np.moveaxis(np.tensordot(redrawn, kernel, axes=([axis], [0])), -1, axis)
+        redrawn = redrawn.ravel()
+        return (1 - self.proportion) * computers + self.proportion * redrawn
+
+    def cycles(self, num_cycles: int) -> np.ndarray:
+        # Compromised coverage after the installation step of every cycle
+        computers = self.computers
+        statuses = self.statuses
+        compromised = (statuses >= INSTALLED).any(axis=1)
+        any_installed = (statuses == INSTALLED).any(axis=1)
+        present = (statuses != ABSENT).T @ computers
+        # Probability that the app at the end of an app graph edge was installed in the previous cycle through
+        # another link than this edge
+        through_edge = {i: ((statuses[:, i] == INSTALLED) @ computers) / present[i] if present[i] else 0.0 for i in self.apps}
+        coverage = []
+        for _ in range(num_cycles):
+            coverage.append(float(compromised @ computers))
+            # Nothing installed in this cycle, nothing can be reached any more
+            if any_installed @ computers < 1e-12:
+                coverage.extend([coverage[-1]] * (num_cycles - len(coverage)))
+                break
+            if self.proportion:
+                computers = self.redraw(computers)
+            # Chance for an app to be reached by its app graph neighbours, as a node and as an edge end
+            hit = np.array([1 - self.no_layer_neighbour(SOFTWARE_TYPES[i], through_edge[i]) for i in self.apps])
+            hit_excess = np.array([1 - self.no_layer_neighbour(SOFTWARE_TYPES[i], through_edge[i], excess=True) for i in self.apps])
+            for j, i in enumerate(self.apps):
+                untouched = statuses[:, i] == UNTOUCHED
+                reached = 1 - (1 - self.host_reach[:, i]) * (1 - hit_excess[j])
+                through_edge[i] = (untouched * reached) @ computers / present[i] if present[i] else 0.0
+            weights = np.prod(np.where(self.hit_patterns, hit, 1 - hit), axis=1)
+            computers = np.bincount(self.transitions.ravel(), weights=(computers[:, None] * weights[None, :]).ravel(), minlength=len(statuses))
+        return np.array(coverage)
+
+    def coverage(self, time_steps: int) -> np.ndarray:
+        # Predicted compromised coverage (CC) after each step
+        return np.repeat(self.cycles(math.ceil(time_steps / CYCLE)), CYCLE)[:time_steps]
+
+    def tts(self, taus: list[float], time_steps: int = 500) -> list[int]:
+        # First step at which the predicted CC reaches each tau, None if it does not within time_steps
+        cc = self.coverage(time_steps)
+        index = np.searchsorted(np.maximum.accumulate(cc), np.asarray(taus, dtype=float), side='left')
+        return [int(i) if i < time_steps else None for i in index.tolist()]
+
+
+class CalibrationReport:
+    def __init__(self, taus: list[float], tolerance: float = 0.05):
+        self.taus = list(taus)
+        # Largest CC root mean square error for a configuration to be trusted
+        self.tolerance = tolerance
+        self.rows = []
+
+    def add(self, name: str, mc_cc: np.ndarray, surrogate_cc: np.ndarray, mc_tts: EnsembleResult, surrogate_tts: list[int], mc_seconds: float, surrogate_seconds: float):
+        # mc_cc and surrogate_cc are the CC curves averaged over the replicas
+        error = surrogate_cc - mc_cc
+        self.rows.append({
+            'name': name,
+            'cc_rmse': float(np.sqrt(np.mean(error ** 2))),
+            'cc_max_error': float(np.max(np.abs(error))),
+            'mc_tts': mc_tts,
+            'surrogate_tts': surrogate_tts,
+            # Surrogate TTS minus the Monte Carlo mean, NaN where either did not reach the tau
+            'tts_error': np.array([math.nan if tts is None else tts - mean for tts, mean in zip(surrogate_tts, mc_tts.mean)]),
+            'speedup': mc_seconds / surrogate_seconds if surrogate_seconds else math.inf,
+        })
+
+    def trusted(self) -> dict[str, bool]:
+        return {row['name']: row['cc_rmse'] <= self.tolerance for row in self.rows}
+
+    def summary(self) -> str:
+        lines = [f"{'configuration':<24} {'cc_rmse':>8} {'cc_max':>8} {'tts_mae':>8} {'speedup':>8} {'trusted':>8}"]
+        for row in self.rows:
+            errors = row['tts_error'][~np.isnan(row['tts_error'])]
+            mae = np.abs(errors).mean() if len(errors) else math.nan
+            lines.append(f"{row['name']:<24} {row['cc_rmse']:>8.3f} {row['cc_max_error']:>8.3f} {mae:>8.2f} {row['speedup']:>8.0f} {str(row['cc_rmse'] <= self.tolerance):>8}")
+        for row in self.rows:
+            lines.append("")
+            lines.append(f"{row['name']}: {'tau':>6} {'mc_mean':>8} {'ci_low':>8} {'ci_high':>8} {'reached':>8} {'surrogate':>9}")
+            mc = row['mc_tts']
+            for i, tau in enumerate(self.taus):
+                surrogate = '-' if row['surrogate_tts'][i] is None else row['surrogate_tts'][i]
+                lines.append(f"{'':<{len(row['name']) + 1}} {tau:>6.2f} {mc.mean[i]:>8.2f} {mc.ci[i, 0]:>8.2f} {mc.ci[i, 1]:>8.2f} {mc.reached[i]:>8.2f} {surrogate:>9}")
+        return "\n".join(lines)
+
+
+def calibrate(configs: dict[str, dict], taus: list[float], replicas: int = 20, time_steps: int = 100, seed: int = 0, tolerance: float = 0.05, confidence: float = 0.95) -> CalibrationReport:
+    # Compare the surrogate with Monte Carlo runs of each configuration (network_params, d_strategy, d_algorithm
+    # and engine, as in run_adaptive). Both see the same replica networks, the surrogate being built before the run
+    report = CalibrationReport(taus, tolerance)
+    for name, config in configs.items():
+        d_strategy = config.get('d_strategy', 'Static')
+        mc_cc = np.zeros((replicas, time_steps))
+        surrogate_cc = np.zeros((replicas, time_steps))
+        mc_seconds = surrogate_seconds = 0.0
+        for replica in range(replicas):
+            network = Network(**config['network_params'], seed=replica_seed(seed, replica))
+            start = time.perf_counter()
+            surrogate_cc[replica] = MeanFieldSurrogate(network, d_strategy).coverage(time_steps)
+            surrogate_seconds += time.perf_counter() - start
+            start = time.perf_counter()
+            simulation = Simulation(network, d_strategy, config.get('d_algorithm', 'Random'), config.get('engine', 'object'))
+            for metrics in simulation.steps(time_steps):
+                mc_cc[replica, metrics['t']] = metrics['cc']
+            mc_seconds += time.perf_counter() - start
+        # TTS of each replica, first step at which its CC reached each tau
+        peak = np.maximum.accumulate(mc_cc, axis=1)
+        mc_tts = np.array([[np.argmax(row >= tau) if row[-1] >= tau else math.nan for tau in taus] for row in peak], dtype=float)
+        mean_surrogate_cc = surrogate_cc.mean(axis=0)
+        index = np.searchsorted(np.maximum.accumulate(mean_surrogate_cc), np.asarray(taus, dtype=float), side='left')
+        surrogate_tts = [int(i) if i < time_steps else None for i in index.tolist()]
+        report.add(name, mc_cc.mean(axis=0), mean_surrogate_cc, EnsembleResult(taus, mc_tts, confidence), surrogate_tts, mc_seconds, surrogate_seconds)
+    return report
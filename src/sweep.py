@@ -0,0 +1,185 @@
+import os
+import json
+import time
+import hashlib
+import contextlib
+import itertools
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from .ensemble import run_replica
+
+# Parameters of one sweep cell and their defaults
+SWEEP_PARAMS = {
+    'num_computers': 250,
+    'num_app_versions': 3,
+    'num_exploits': 2,
+    'compromised_sw': 5,
+    'd_strategy': 'Static',
+    'd_algorithm': 'Random',
+    'time_steps': 30,
+    'taus': [0.05 * i for i in range(11)],
+    'seed': 0,
+}
+NETWORK_PARAMS = ['num_computers', 'num_app_versions', 'compromised_sw', 'num_exploits']
+# Version of the model behind the cached results, part of every cell key. Bump it whenever the same cell
+# parameters would produce different results, so the cells cached before are recomputed instead of reused
+MODEL_VERSION = 2
+
+
+def sweep_cells(grid: dict[str, list]) -> list[dict]:
+    # Cartesian product of the candidate values, every value of the grid is a list of candidates
+    unknown = set(grid) - set(SWEEP_PARAMS)
+    if unknown:
+        raise ValueError(f"Unknown sweep parameters: {sorted(unknown)}")
+    names = list(SWEEP_PARAMS)
+    candidates = [grid.get(name, [SWEEP_PARAMS[name]]) for name in names]
+    cells = []
+    for values in itertools.product(*candidates):
+        cell = dict(zip(names, values))
+        cell['taus'] = [float(tau) for tau in cell['taus']]
+        cells.append(cell)
+    return cells
+
+
+def cell_key(cell: dict) -> str:
+    # Content hash of the cell parameters and the model version
+    return hashlib.sha256(json.dumps({'model_version': MODEL_VERSION, 'cell': cell}, sort_keys=True).encode()).hexdigest()[:20]
+
+
+def run_cell(cell: dict) -> np.ndarray:
+    network_params = {name: cell[name] for name in NETWORK_PARAMS}
+    tts = run_replica(network_params, cell['d_strategy'], cell['d_algorithm'], cell['time_steps'], cell['taus'], cell['seed'])
+    return np.array(tts, dtype=float)
+
+
+# On-disk results: one shard per finished cell, packed into a single columnar table on demand
+class ResultCache:
+    def __init__(self, path: str):
+        self.path = path
+        self.shard_dir = os.path.join(path, 'cells')
+        self.table_path = os.path.join(path, 'table.npz')
+        os.makedirs(self.shard_dir, exist_ok=True)
+        self.packed = self.load_packed_keys()
+
+    def load_packed_keys(self) -> set[str]:
+        if not os.path.exists(self.table_path):
+            return set()
+        with np.load(self.table_path) as table:
+            return set(table['key'].tolist())
+
+    def load_table(self) -> dict[str, np.ndarray]:
+        # Packed table as it is on disk, another sweep sharing the directory may have packed it
+        if not os.path.exists(self.table_path):
+            return {}
+        with np.load(self.table_path) as table:
+            return {name: table[name] for name in table.files}
+
+    def shard_path(self, key: str) -> str:
+        return os.path.join(self.shard_dir, f'{key}.npz')
+
+    def has(self, key: str) -> bool:
+        return key in self.packed or os.path.exists(self.shard_path(key))
+
+    def put(self, key: str, cell: dict, tts: np.ndarray):
+        # Write to a temporary file first so an interrupted sweep never leaves a partial shard
+        path = self.shard_path(key)
+        temp_path = f'{path}.{os.getpid()}.tmp.npz'
+        np.savez(temp_path, cell=np.array(json.dumps(cell, sort_keys=True)), tts=tts)
+        os.replace(temp_path, path)
+
+    def shard_columns(self) -> dict[str, list]:
+        columns = {name: [] for name in ['key'] + list(SWEEP_PARAMS) + ['tau', 'tts']}
+        del columns['taus']
+        for name in sorted(os.listdir(self.shard_dir)):
+            if not name.endswith('.npz') or '.tmp' in name:
+                continue
+            key = name[:-len('.npz')]
+            if key in self.packed:
+                continue
+            with np.load(os.path.join(self.shard_dir, name)) as shard:
+                cell = json.loads(str(shard['cell']))
+                tts = shard['tts']
+            for tau, value in zip(cell['taus'], tts.tolist()):
+                columns['key'].append(key)
+                for param in SWEEP_PARAMS:
+                    if param != 'taus':
+                        columns[param].append(cell[param])
+                columns['tau'].append(tau)
+                columns['tts'].append(value)
+        return columns
+
+    def table(self) -> dict[str, np.ndarray]:
+        # Long format: one row per (cell, tau), the packed table then the shards not packed yet
+        packed = self.load_table()
+        self.packed = set(packed['key'].tolist()) if packed else set()
+        columns = {name: np.array(values) for name, values in self.shard_columns().items()}
+        if packed:
+            columns = {name: np.concatenate([packed[name], values]) if len(values) else packed[name] for name, values in columns.items()}
+        return columns
+
+    @contextlib.contextmanager
+    def lock(self, timeout: float = 60.0):
+        # Exclusive lock file, a lock older than timeout was left by an interrupted sweep and is broken
+        path = os.path.join(self.path, 'table.lock')
+        while True:
+            try:
+                fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                break
+            except FileExistsError:
+                try:
+                    if time.time() - os.path.getmtime(path) > timeout:
+                        os.remove(path)
+                        continue
+                except FileNotFoundError:
+                    continue
+                time.sleep(0.05)
+        try:
+            yield
+        finally:
+            os.close(fd)
+            os.remove(path)
+
+    def pack(self) -> dict[str, np.ndarray]:
+        # Merge the shards into table.npz and remove them, returns the merged table. The table is re-read
+        # from disk under the lock, so sweeps sharing the directory do not drop the cells the others packed
+        with self.lock():
+            table = self.table()
+            keys = set(table['key'].tolist())
+            if keys == self.packed:
+                return table
+            temp_path = f'{self.table_path}.{os.getpid()}.tmp.npz'
+            np.savez_compressed(temp_path, **table)
+            os.replace(temp_path, self.table_path)
+            for key in keys - self.packed:
+                if os.path.exists(self.shard_path(key)):
+                    os.remove(self.shard_path(key))
+            self.packed = keys
+        return table
+
+
+def run_sweep(grid: dict[str, list], cache_dir: str, workers: int = None) -> dict[str, np.ndarray]:
+    # Compute the cells that are not cached yet and return the whole sweep as columns
+    cache = ResultCache(cache_dir)
+    cells = sweep_cells(grid)
+    missing = {}
+    for cell in cells:
+        key = cell_key(cell)
+        if not cache.has(key):
+            missing[key] = cell
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        for key, cell in missing.items():
+            cache.put(key, cell, run_cell(cell))
+    elif missing:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(run_cell, cell): key for key, cell in missing.items()}
+            for future in as_completed(futures):
+                key = futures[future]
+                cache.put(key, missing[key], future.result())
+    # Fold the new cells into the columnar table, an interrupted sweep resumes from the cell files instead
+    table = cache.pack()
+    keys = {cell_key(cell) for cell in cells}
+    selected = np.isin(table['key'], list(keys))
+    return {name: values[selected] for name, values in table.items()}
@@ -1,57 +1,206 @@
-import matplotlib.pyplot as plt
-import matplotlib.cm as cm
+import os
 
-from .models import Network
+import numpy as np
 
-def plot(network: Network):
-    fig = plt.figure()
+from .models import Network, layer_csr
+from .recorder import TrajectoryRecorder
+
+LAYERS = {'OS': 0, 'APP1': 1, 'APP2': 2}
+LAYER_COLORMAPS = {'OS': 'Blues', 'APP1': 'Reds', 'APP2': 'Greens'}
+LAYER_MARKERS = {'OS': 'o', 'APP1': '^', 'APP2': '^'}
+# Colors of the software states (vulnerable, compromised, not vulnerable) and attack phases (-1 to 5)
+STATE_COLORS = ['orange', 'red', 'green']
+PHASE_COLORMAP = 'plasma'
+
+
+def new_figure(path: str = None):
+    # Headless figure on the Agg canvas when saving to a file, a pyplot figure when showing it
+    if path is not None:
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        fig = Figure()
+        FigureCanvasAgg(fig)
+        return fig
+    import matplotlib.pyplot as plt
+    return plt.figure()
+
+
+# Static geometry of a network drawn with one artist per layer: a scatter of the software,
+# a line collection of the app graph edges, and one line collection of the OS to app links
+class NetworkScene:
+    def __init__(self, network: Network, ax, color_by: str = "implementation", max_edges: int = 20000, label_limit: int = 100, seed: int = 0):
+        from matplotlib import colormaps
+        from mpl_toolkits.mplot3d.art3d import Line3DCollection
+
+        self.network = network
+        self.ax = ax
+        self.color_by = color_by
+        self.colormaps = {sw_type: colormaps[name] for sw_type, name in LAYER_COLORMAPS.items()}
+        self.phase_colormap = colormaps[PHASE_COLORMAP]
+        # Software of each layer, in the node order of the app graphs, and their position in Network.get_softwares
+        self.all_software = network.get_softwares()
+        self.software = {sw_type: [] for sw_type in LAYERS}
+        layer_index = {sw_type: [] for sw_type in LAYERS}
+        for i, sw in enumerate(self.all_software):
+            self.software[sw.get_software_type()].append(sw)
+            layer_index[sw.get_software_type()].append(i)
+        self.layer_index = {sw_type: np.array(index, dtype=np.int64) for sw_type, index in layer_index.items()}
+        self.positions = {sw_type: np.array([(sw.host.x_position, sw.host.y_position, z) for sw in self.software[sw_type]], dtype=float).reshape(-1, 3)
+                          for sw_type, z in LAYERS.items()}
+        # Implementations in the order of Network.get_implementations (and NetworkArrays.implementations),
+        # with their position within the versions of their type for the implementation colors
+        self.implementations = network.get_implementations()
+        self.implementation_index = {implementation: i for i, implementation in enumerate(self.implementations)}
+        versions = [network.os_versions, network.app1_versions, network.app2_versions]
+        self.version_rank = np.array([(i + 1) / len(layer_versions) for layer_versions in versions for i in range(len(layer_versions))], dtype=float)
+
+        # Level of detail: keep at most max_edges app graph edges, drawn uniformly at random
+        rng = np.random.default_rng(seed)
+        edges = {sw_type: self.layer_edges(graph) for sw_type, graph in network.graph.items()}
+        total = sum(len(layer_edges) for layer_edges in edges.values())
+        if max_edges is not None and total > max_edges:
+            edges = {sw_type: layer_edges[np.sort(rng.choice(len(layer_edges), round(len(layer_edges) * max_edges / total), replace=False))]
+                     for sw_type, layer_edges in edges.items()}
+        self.edges = edges
+        # add_collection3d fails on an empty collection, a layer without edges gets none
+        self.edge_collections = {}
+        for sw_type, layer_edges in edges.items():
+            if len(layer_edges):
+                segments = self.positions[sw_type][layer_edges]
+                self.edge_collections[sw_type] = ax.add_collection3d(Line3DCollection(segments, colors='black', linewidths=0.3, alpha=0.3))
+
+        # OS to app links, the OS and apps of a computer share their x and y
+        hosts = [(sw.host.x_position, sw.host.y_position) for sw_type in ['APP1', 'APP2'] for sw in self.software[sw_type]]
+        layers = [LAYERS[sw_type] for sw_type in ['APP1', 'APP2'] for _ in self.software[sw_type]]
+        links = np.array([[(x, y, LAYERS['OS']), (x, y, z)] for (x, y), z in zip(hosts, layers)], dtype=float).reshape(-1, 2, 3)
+        self.link_collection = ax.add_collection3d(Line3DCollection(links, colors='black', linewidths=0.3, alpha=0.3)) if len(links) else None
+
+        # Colored value (state, attack phase or implementation index) and color of every software of each layer
+        self.scatters = {}
+        self.values = {}
+        self.colors = {}
+        values = self.software_values()
+        for sw_type, positions in self.positions.items():
+            self.values[sw_type] = values[self.layer_index[sw_type]]
+            self.colors[sw_type] = self.value_colors(sw_type, self.values[sw_type])
+            self.scatters[sw_type] = ax.scatter(positions[:, 0], positions[:, 1], positions[:, 2], c=self.colors[sw_type], marker=LAYER_MARKERS[sw_type], depthshade=False)
+
+        # Labels only for small networks, thousands of text artists make the figure unusable
+        if network.num_computers <= label_limit:
+            for sw_type, positions in self.positions.items():
+                for sw, position in zip(self.software[sw_type], positions):
+                    ax.text(*position, f'{sw.host.id}-{sw_type}', color='black')
+
+        ax.set_xlabel('X Position')
+        ax.set_ylabel('Y Position')
+        ax.set_zlabel('Layer')
+
+    def layer_edges(self, graph) -> np.ndarray:
+        # Each edge of an app graph once as a row of node indices
+        indptr, indices = layer_csr(graph)
+        sources = np.repeat(np.arange(len(indptr) - 1, dtype=np.int64), np.diff(indptr))
+        indices = np.asarray(indices, dtype=np.int64)
+        upper = sources < indices
+        return np.stack([sources[upper], indices[upper]], axis=1)
+
+    def software_values(self, arrays=None) -> np.ndarray:
+        # Colored value of every software in Network.get_softwares order, read from NetworkArrays when given
+        if self.color_by == "state":
+            return arrays.state if arrays is not None else np.array([sw.state for sw in self.all_software], dtype=np.int64)
+        if self.color_by == "attack_phase":
+            return arrays.attack_phase if arrays is not None else np.array([sw.attack_phase for sw in self.all_software], dtype=np.int64)
+        if arrays is not None:
+            return arrays.implementation
+        return np.array([self.implementation_index[sw.implementation] for sw in self.all_software], dtype=np.int64)
+
+    def value_colors(self, sw_type: str, values: np.ndarray) -> np.ndarray:
+        # RGBA colors of software values of one layer, according to color_by
+        if self.color_by == "state":
+            from matplotlib.colors import to_rgba_array
+            return to_rgba_array(STATE_COLORS)[values].reshape(-1, 4)
+        if self.color_by == "attack_phase":
+            return self.phase_colormap((values.astype(float) + 1) / 6).reshape(-1, 4)
+        return self.colormaps[sw_type](self.version_rank[values]).reshape(-1, 4)
+
+    def update(self, arrays=None) -> int:
+        # Recolor the software whose value changed since the last update, returns how many did
+        values = self.software_values(arrays)
+        changed_count = 0
+        for sw_type, index in self.layer_index.items():
+            layer_values = values[index]
+            changed = np.flatnonzero(layer_values != self.values[sw_type])
+            if len(changed) == 0:
+                continue
+            self.values[sw_type][changed] = layer_values[changed]
+            self.colors[sw_type][changed] = self.value_colors(sw_type, layer_values[changed])
+            self.scatters[sw_type].set_facecolor(self.colors[sw_type])
+            self.scatters[sw_type].set_edgecolor(self.colors[sw_type])
+            changed_count += len(changed)
+        return changed_count
+
+
+def plot(network: Network, path: str = None, color_by: str = "implementation", max_edges: int = 20000, label_limit: int = 100, seed: int = 0, dpi: int = 150):
+    # Draw the three layers of the network, saving the figure to path (no display needed) or showing it.
+    # Above label_limit computers the labels are dropped, above max_edges edges the app graphs are subsampled
+    fig = new_figure(path)
     ax = fig.add_subplot(111, projection='3d')
+    scene = NetworkScene(network, ax, color_by, max_edges, label_limit, seed)
+    if path is not None:
+        fig.savefig(path, dpi=dpi)
+    else:
+        import matplotlib.pyplot as plt
+        plt.show()
+    return scene
+
 
-    layers = {'OS': 0, 'APP1': 1, 'APP2': 2}
-
-    cmap_os = cm.get_cmap('Blues')
-    cmap_app1 = cm.get_cmap('Reds')
-    cmap_app2 = cm.get_cmap('Greens')
-    num_types = network.num_app_versions  # 假设implementation_type的数量
-
-
-    for computer in network.computers:
-        # determine the color based on the implementation type
-        os_color = cmap_os(computer.os.implementation.implementation_type / num_types)
-        os_position = (computer.x_position, computer.y_position, layers['OS'])
-        ax.scatter(*os_position[:-1], os_position[2], c=os_color, marker='o')
-        ax.text(*os_position, f'{computer.id}-OS', color='black')
-        
-        # store the positions of the apps
-        app_positions = []
-        
-        # APPs
-        for app in computer.apps:
-            z_layer = layers[app.get_software_type()]
-            app_position = (computer.x_position, computer.y_position, z_layer)
-            if app.get_software_type() == 'APP1':
-                app_color = cmap_app1(app.implementation.implementation_type / num_types)
-            elif app.get_software_type() == 'APP2':
-                app_color = cmap_app2(app.implementation.implementation_type / num_types)
-            ax.scatter(*app_position[:-1], app_position[2], c=app_color, marker='^')
-            ax.text(*app_position, f'{computer.id}-{app.get_software_type()}', color='black')
-            
-            app_positions.append(app_position)
-        
-        # Draw the edges between OS and APPs
-        for app_pos in app_positions:
-            ax.plot([os_position[0], app_pos[0]], [os_position[1], app_pos[1]], [os_position[2], app_pos[2]], c='black')
-
-    # Draw the edges
-    for app_name, graph in network.graph.items():
-        z_layer = layers[app_name]
-        for edge in graph.edges():
-            x_positions = [network.computers[edge[0].id].x_position, network.computers[edge[1].id].x_position]
-            y_positions = [network.computers[edge[0].id].y_position, network.computers[edge[1].id].y_position]
-            z_positions = [z_layer, z_layer]
-            ax.plot(x_positions, y_positions, z_positions, c='black')
-    
-    ax.set_xlabel('X Position')
-    ax.set_ylabel('Y Position')
-    ax.set_zlabel('Layer')
-    plt.show()
\ No newline at end of file
+class FrameWriter:
+    # Writes the frames of a figure as a GIF (Pillow), a video (ffmpeg) or, for any other path, a directory of PNG images
+    def __init__(self, fig, path: str, fps: int = 4, dpi: int = 100):
+        self.fig = fig
+        self.path = path
+        self.dpi = dpi
+        self.count = 0
+        extension = os.path.splitext(path)[1].lower()
+        if extension == '.gif':
+            from matplotlib.animation import PillowWriter
+            self.writer = PillowWriter(fps=fps)
+        elif extension in ('.mp4', '.mkv', '.avi', '.mov', '.webm'):
+            from matplotlib.animation import FFMpegWriter
+            self.writer = FFMpegWriter(fps=fps)
+        else:
+            self.writer = None
+            os.makedirs(path, exist_ok=True)
+        if self.writer is not None:
+            self.writer.setup(fig, path, dpi)
+
+    def write(self):
+        if self.writer is not None:
+            self.writer.grab_frame()
+        else:
+            self.fig.savefig(os.path.join(self.path, f'frame_{self.count:05d}.png'), dpi=self.dpi)
+        self.count += 1
+
+    def finish(self):
+        if self.writer is not None:
+            self.writer.finish()
+
+
+def animate(simulation, time_steps: int, path: str, color_by: str = "state", fps: int = 4, max_edges: int = 20000, label_limit: int = 100, seed: int = 0, dpi: int = 100) -> TrajectoryRecorder:
+    # Run the simulation for time_steps steps, writing one frame per step to path (see FrameWriter).
+    # The geometry is built once, each frame only recolors the software whose value changed
+    fig = new_figure(path)
+    ax = fig.add_subplot(111, projection='3d')
+    scene = NetworkScene(simulation.network, ax, color_by, max_edges, label_limit, seed)
+    writer = FrameWriter(fig, path, fps, dpi)
+    recorder = TrajectoryRecorder(time_steps)
+    ax.set_title(f"Start; VC: {simulation.network.vc:.2f}; CC: {simulation.network.cc:.2f}; IC: {simulation.network.ic:.2f}", fontsize=8)
+    writer.write()
+    for metrics in simulation.steps(time_steps):
+        recorder.append(metrics)
+        scene.update(simulation.arrays)
+        ax.set_title(f"At time {metrics['t']}; VC: {metrics['vc']:.2f}; CC: {metrics['cc']:.2f}; IC: {metrics['ic']:.2f}", fontsize=8)
+        writer.write()
+    writer.finish()
+    simulation.recorder = recorder
+    simulation.sync_network()
+    return recorder
@@ -0,0 +1,90 @@
+import pytest
+
+from src import Network, Simulation, Attacker
+
+TAUS = [0.05 * i for i in range(11)]
+
+
+# Reference attacker scanning its whole knowledge in every phase, as before the per-phase frontiers
+class FullScanAttacker(Attacker):
+    def init_knowledge(self) -> set:
+        # Also takes over the software the attacker of the simulation already marked as discovered
+        knowledge = {sw for sw in self.network.get_softwares() if sw.state == 1 and sw.attack_phase in (-1, 0)}
+        for sw in knowledge:
+            sw.attack_phase = 0
+        return knowledge
+
+    def installation_phase(self):
+        for sw in self.knowledge:
+            if sw.attack_phase == 0:
+                sw.attack_phase = 1
+                sw.state = 1
+
+    def discovery_phase(self):
+        discovered_sws = set()
+        for sw in self.knowledge:
+            if sw.attack_phase == 1:
+                sw.attack_phase = 2
+                for connected_sw in self.network.get_connected_software(sw):
+                    if connected_sw.attack_phase == -1 and connected_sw not in self.knowledge and connected_sw.state != 2:
+                        if self.network.exploitable[connected_sw.implementation]:
+                            discovered_sws.add(connected_sw)
+        self.knowledge.update(discovered_sws)
+
+    def privilege_escalation_phase(self):
+        for sw in self.knowledge:
+            if sw.get_software_type() != 'OS' and sw.attack_phase == 2:
+                sw.attack_phase = 3
+                for connected_sw in self.network.get_connected_software(sw):
+                    if connected_sw.attack_phase == -1 and connected_sw in self.knowledge and connected_sw.get_software_type() == 'OS':
+                        connected_sw.attack_phase = 0
+
+    def lateral_movement_phase(self):
+        for sw in self.knowledge:
+            if sw.attack_phase == 2 or sw.attack_phase == 3:
+                sw.attack_phase = 4
+                for connected_sw in self.network.get_connected_software(sw):
+                    if connected_sw.attack_phase == -1 and connected_sw in self.knowledge and connected_sw.get_software_type() != 'OS':
+                        connected_sw.attack_phase = 0
+
+    def causing_damages_phase(self):
+        for sw in self.knowledge:
+            if sw.attack_phase == 4:
+                sw.attack_phase = 5
+
+    def phase_counts(self) -> list[int]:
+        counts = [0] * 6
+        for sw in self.knowledge:
+            if sw.attack_phase >= 0:
+                counts[sw.attack_phase] += 1
+        return counts
+
+
+def simulations(network: Network, seed: int, d_strategy: str, **defender_params) -> list[Simulation]:
+    # The frontier attacker and the full scan reference on forks of one seeded network
+    frontier = Simulation(network.fork(seed), d_strategy, 'Random', **defender_params)
+    full_scan = Simulation(network.fork(seed), d_strategy, 'Random', **defender_params)
+    full_scan.attacker = FullScanAttacker(full_scan.network)
+    return [frontier, full_scan]
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+@pytest.mark.parametrize('d_strategy, defender_params', [
+    ('Static', {}),
+    ('Proactive', {}),
+    ('Reactive', {'budget': 10}),
+])
+def test_frontier_attacker_matches_full_scan(seed, d_strategy, defender_params):
+    frontier, full_scan = simulations(Network(120, 3, 4, seed=seed), seed, d_strategy, **defender_params)
+    for step in zip(frontier.steps(40), full_scan.steps(40)):
+        assert step[0] == step[1]
+        assert [(sw.state, sw.attack_phase, sw.implementation) for sw in frontier.network.get_softwares()] == \
+            [(sw.state, sw.attack_phase, sw.implementation) for sw in full_scan.network.get_softwares()]
+    assert frontier.attacker.knowledge == {frontier.network.get_softwares()[i] for i, sw in enumerate(full_scan.network.get_softwares()) if sw in full_scan.attacker.knowledge}
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+@pytest.mark.parametrize('d_strategy', ['Static', 'Proactive'])
+def test_frontier_attacker_tts_matches_full_scan(seed, d_strategy):
+    results = [simulation.run(60, TAUS, verbose=False) for simulation in simulations(Network(150, 2, 3, seed=seed), seed, d_strategy)]
+    assert results[0] == results[1]
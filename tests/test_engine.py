@@ -0,0 +1,38 @@
+import pytest
+
+from src import Network, Simulation
+
+TAUS = [0.05 * i for i in range(11)]
+
+
+def software_state(simulation: Simulation) -> list[tuple]:
+    # State, attack phase and implementation of every software, from the arrays for the array engine
+    network = simulation.network
+    if simulation.arrays is not None:
+        arrays = simulation.arrays
+        return list(zip(arrays.state.tolist(), arrays.attack_phase.tolist(), [arrays.implementations[i] for i in arrays.implementation.tolist()]))
+    return [(sw.state, sw.attack_phase, sw.implementation) for sw in network.get_softwares()]
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+@pytest.mark.parametrize('d_strategy, d_algorithm, defender_params', [
+    ('Static', 'Random', {}),
+    ('Proactive', 'Random', {}),
+    ('Proactive', 'ColorFlipping', {}),
+    ('Reactive', 'Random', {'response_latency': 1, 'budget': 10}),
+])
+def test_array_engine_matches_object_engine(seed, d_strategy, d_algorithm, defender_params):
+    # Both engines on forks of one seeded network draw the same random choices, step by step
+    network = Network(120, 3, 4, seed=seed)
+    simulations = [Simulation(network.fork(seed), d_strategy, d_algorithm, engine, **defender_params) for engine in ['object', 'array']]
+    for step in zip(*(simulation.steps(40) for simulation in simulations)):
+        assert step[0] == step[1]
+        assert software_state(simulations[0]) == software_state(simulations[1])
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+@pytest.mark.parametrize('d_strategy', ['Static', 'Proactive'])
+def test_array_engine_tts_matches_object_engine(seed, d_strategy):
+    network = Network(150, 2, 3, seed=seed)
+    results = [Simulation(network.fork(seed), d_strategy, 'Random', engine).run(60, TAUS, verbose=False) for engine in ['object', 'array']]
+    assert results[0] == results[1]
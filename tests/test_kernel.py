@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+
+from src import Network, Simulation
+from src.models import NetworkArrays, PropagationKernel
+
+TAUS = [0.05 * i for i in range(11)]
+
+
+def gather_kernel(kernel: PropagationKernel) -> PropagationKernel:
+    # Same adjacency expanded by gathering the neighbour lists, the path taken without scipy
+    gather = PropagationKernel(kernel.indptr, kernel.indices)
+    gather.matrix = None
+    return gather
+
+
+@pytest.mark.parametrize('graph_model', ['pairwise', 'gnp', 'spatial'])
+def test_sparse_kernel_matches_gather_and_connected_software(graph_model):
+    network = Network(150, 3, 4, seed=0, graph_model=graph_model, mean_degree=4)
+    arrays = NetworkArrays(network)
+    assert arrays.kernel.matrix is not None
+    gather = gather_kernel(arrays.kernel)
+    rng = np.random.default_rng(0)
+    masks = rng.random((6, len(arrays.software))) < [[0.0], [0.01], [0.05], [0.2], [0.5], [1.0]]
+    for mask in masks:
+        expected = np.zeros(len(arrays.software), dtype=bool)
+        for i in np.flatnonzero(mask):
+            for connected_sw in network.get_connected_software(arrays.software[i]):
+                expected[arrays.software_index[connected_sw]] = True
+        assert np.array_equal(arrays.kernel.expand(mask), expected)
+        assert np.array_equal(gather.expand(mask), expected)
+    # One row per replica
+    assert np.array_equal(arrays.kernel.expand(masks), gather.expand(masks))
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+@pytest.mark.parametrize('d_strategy', ['Static', 'Proactive'])
+def test_sparse_kernel_run_matches_gather(seed, d_strategy):
+    network = Network(150, 2, 3, seed=seed)
+    simulations = [Simulation(network.fork(seed), d_strategy, 'Random', 'array') for _ in range(2)]
+    simulations[1].arrays.kernel = gather_kernel(simulations[1].arrays.kernel)
+    for step in zip(*(simulation.steps(60) for simulation in simulations)):
+        assert step[0] == step[1]
+        assert np.array_equal(simulations[0].arrays.state, simulations[1].arrays.state)
+        assert np.array_equal(simulations[0].arrays.attack_phase, simulations[1].arrays.attack_phase)
+    results = [Simulation(network.fork(seed), d_strategy, 'Random', 'array') for _ in range(2)]
+    results[1].arrays.kernel = gather_kernel(results[1].arrays.kernel)
+    assert results[0].run(60, TAUS, verbose=False) == results[1].run(60, TAUS, verbose=False)